@@ -1,8 +1,21 @@
+import argparse
+
 from acestream_search.gui import GuiApp
 
 
 def main():
-    app = GuiApp()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--adb-server',
+        action='store_true',
+        default=False,
+        help='Download the ADB binary and run a local ADB server before '
+        'sending links to Android devices. Only needed if the direct '
+        'connection to the devices does not work (default: False)'
+    )
+    args = parser.parse_args()
+
+    app = GuiApp(use_adb_server=args.adb_server)
     app.run()
 
 
@@ -1,7 +1,31 @@
 import argparse
 
 from acestream_search.common.constants import CATEGORIES
-from acestream_search.events import run
+from acestream_search.common.constants import CATEGORY_CONCURRENCY
+from acestream_search.common.constants import HTML_PARSERS
+from acestream_search.common.constants import IPFS_LOCAL_GATEWAY
+from acestream_search.common.constants import IPFS_PUBLIC_GATEWAYS
+from acestream_search.common.constants import MIRROR_CANDIDATES
+from acestream_search.common.constants import MIRROR_CONCURRENCY
+from acestream_search.common.constants import OUTPUT_FORMATS
+from acestream_search.common.constants import SERVE_HOST
+from acestream_search.common.constants import SERVE_HOURS
+from acestream_search.common.constants import SERVE_INTERVAL
+from acestream_search.common.constants import SERVE_PORT
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not a positive number')
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f'{value} is a negative number')
+    return number
 
 
 def main():
@@ -34,8 +58,188 @@ def main():
         default=False,
         help='Show events with no available acestream links (default: False)'
     )
+    parser.add_argument(
+        '--concurrency',
+        type=positive_int,
+        default=CATEGORY_CONCURRENCY,
+        help='Maximum number of category pages fetched at the same time '
+        f'(default: {CATEGORY_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--parser',
+        type=str,
+        choices=HTML_PARSERS,
+        default=None,
+        help='HTML parser backend (default: lxml if installed, '
+        'otherwise html.parser)'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        default=False,
+        help='Do not read or write the local HTTP cache (default: False)'
+    )
+    parser.add_argument(
+        '--max-age',
+        type=int,
+        default=None,
+        metavar='SECONDS',
+        help='Maximum age of cached pages, overriding the default '
+        'time-to-live of each kind of page (default: None)'
+    )
+    parser.add_argument(
+        '--store',
+        action='store_true',
+        default=False,
+        help='Keep the events in a local database and only fetch the event '
+        'pages that may have changed since the last run (default: False)'
+    )
+    parser.add_argument(
+        '--mirror-candidates',
+        type=non_negative_int,
+        default=MIRROR_CANDIDATES,
+        metavar='COUNT',
+        help='Number of numbered alternative domains probed when the main '
+        f'url is not reachable (default: {MIRROR_CANDIDATES})'
+    )
+    parser.add_argument(
+        '--mirror-concurrency',
+        type=positive_int,
+        default=MIRROR_CONCURRENCY,
+        metavar='COUNT',
+        help='Maximum number of alternative domains probed at the same '
+        f'time (default: {MIRROR_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--ipfs-gateway',
+        type=str,
+        action='append',
+        default=None,
+        metavar='URL',
+        help='IPFS gateway used to fetch the channel list, can be given '
+        'several times. The first one to answer is used (default: '
+        f'{IPFS_LOCAL_GATEWAY}, '
+        f'{", ".join(f"https://{host}" for host in IPFS_PUBLIC_GATEWAYS)})'
+    )
+    parser.add_argument(
+        '--output', '--format',
+        type=str,
+        choices=OUTPUT_FORMATS,
+        default='table',
+        help='Output format. "grid" is a plain ASCII table, "ndjson" writes '
+        'one JSON object per event as soon as it is found (default: table)'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        default=False,
+        help='Keep running and print every event as soon as its acestream '
+        'links show up. Only the pages of the events still without links '
+        'are checked again, more often as kick-off approaches. Not '
+        'available with --output json (default: False)'
+    )
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help='Keep the events and channels in memory, refresh them in the '
+        'background and answer GET /events and GET /channels over HTTP'
+    )
+    serve_parser.add_argument(
+        '--host',
+        type=str,
+        default=SERVE_HOST,
+        help=f'Address to listen on (default: {SERVE_HOST})'
+    )
+    serve_parser.add_argument(
+        '--port',
+        type=int,
+        default=SERVE_PORT,
+        help=f'Port to listen on (default: {SERVE_PORT})'
+    )
+    serve_parser.add_argument(
+        '--hours',
+        type=int,
+        dest='serve_hours',
+        metavar='HOURS',
+        default=SERVE_HOURS,
+        help='Keep the events starting within the next number of hours. '
+        f'Requests cannot ask for more (default: {SERVE_HOURS} hours)'
+    )
+    serve_parser.add_argument(
+        '--interval',
+        type=int,
+        default=SERVE_INTERVAL,
+        metavar='SECONDS',
+        help=f'Time between background refreshes (default: {SERVE_INTERVAL})'
+    )
+    channels_parser = subparsers.add_parser(
+        'channels',
+        help='Search for channels. The channel list is kept locally for an '
+        'hour, so searches do not need the network'
+    )
+    channels_parser.add_argument(
+        '--search',
+        type=str,
+        default=argparse.SUPPRESS,
+        metavar='TEXT',
+        help='Words to look for in the channel names, ignoring case and '
+        'accents (default: any text)'
+    )
+    channels_parser.add_argument(
+        '--diff',
+        action='store_true',
+        default=False,
+        help='Print the channels added, removed or with changed links by '
+        'the last refresh of the channel list, as JSON (default: False)'
+    )
     args = parser.parse_args()
-    run(args.category, args.search, args.hours, args.show_empty)
+    if args.watch and args.output == 'json':
+        parser.error(
+            '--watch writes one event at a time, use --output ndjson '
+            'instead of json'
+        )
+
+    # Imported once the arguments are valid, so --help and usage errors
+    # do not pay for aiohttp, requests and bs4
+    from acestream_search.common import ipfs
+    from acestream_search.common.cache import http_cache
+    from acestream_search.common.parser import set_parser
+
+    if args.parser:
+        set_parser(args.parser)
+    http_cache.configure(not args.no_cache, args.max_age)
+    ipfs.ipfs_cache.configure(not args.no_cache)
+    if args.ipfs_gateway:
+        ipfs.configure_gateways(args.ipfs_gateway)
+    if args.command == 'channels':
+        from acestream_search.channels import run as run_channels
+
+        run_channels(
+            args.search, args.output,
+            0 if args.no_cache else args.max_age, args.diff
+        )
+        return
+
+    from acestream_search.events import configure_mirrors
+    from acestream_search.store import EventStore
+
+    configure_mirrors(args.mirror_candidates, args.mirror_concurrency)
+    store = EventStore() if args.store else None
+    if args.command == 'serve':
+        from acestream_search.server import serve
+
+        serve(
+            args.host, args.port, args.serve_hours, args.interval,
+            args.concurrency, store
+        )
+        return
+    from acestream_search.events import run
+
+    run(
+        args.category, args.search, args.hours,
+        args.show_empty, args.concurrency,
+        store, args.output, args.watch
+    )
 
 
 if __name__ == '__main__':
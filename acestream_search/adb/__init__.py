@@ -1,38 +1,53 @@
 import ipaddress
+import threading
 
-from acestream_search.adb.download import download_adb_binary
-from acestream_search.adb.server import connect
+from acestream_search.adb.dispatch import Dispatcher
+from acestream_search.adb.pool import DevicePool
 from acestream_search.adb.server import run_adb_command
 from acestream_search.log import logger
 
 
 class Client():
-    def __init__(self):
+    """Send acestream links to Android devices."""
+
+    def __init__(self, use_server=False, callback=None):
+        self.use_server = use_server
         self.adb_path = None
         self.server_running = False
-        self.devices = {}
+        self.lock = threading.Lock()
+        self.pool = DevicePool()
+        self.dispatcher = Dispatcher(self.play_stream, callback)
+
+    def start_server(self) -> bool:
+        from acestream_search.adb.download import download_adb_binary
+
+        with self.lock:
+            if not self.adb_path:
+                self.adb_path = download_adb_binary()
+            if not self.adb_path:
+                return False
+            if not self.server_running:
+                if run_adb_command(self.adb_path, 'kill-server'):
+                    logger.info('Starting ADB server')
+                    self.server_running = run_adb_command(
+                        self.adb_path, 'start-server'
+                    )
+            return self.server_running
 
-    def play_stream(self, ip: str, link: str):
+    def play_stream(self, ip: str, link: str) -> bool:
         try:
             ipaddress.ip_address(ip)
         except ValueError:
             logger.error(f'"{ip}" is not a valid IP address')
-            return
-        if not self.adb_path:
-            self.adb_path = download_adb_binary()
-        if not self.server_running:
-            if run_adb_command(self.adb_path, 'kill-server'):
-                logger.info('Starting ADB server')
-                self.server_running = run_adb_command(
-                    self.adb_path, 'start-server'
-                )
-        if not self.server_running:
-            return
-        if not self.devices.get(ip) or not self.devices.get(ip).available:
-            self.devices[ip] = connect(ip)
-        if not self.devices.get(ip):
-            return
-        logger.info('Sending acestream link to Android device')
-        self.devices.get(ip).shell(
-            f'am start -a android.intent.action.VIEW -d {link}'
-        )
+            return False
+        if self.use_server and not self.start_server():
+            return False
+        logger.info(f'Sending acestream link to Android device {ip}')
+        return self.pool.shell(
+            ip, f'am start -a android.intent.action.VIEW -d {link}'
+        ) is not None
+
+    def play(self, ips: list, link: str):
+        """Send link to every device in ips concurrently, without blocking."""
+
+        self.dispatcher.dispatch(ips, link)
@@ -1,10 +1,14 @@
+import functools
 import os
 
-from adb_shell.auth.keygen import keygen
-from adb_shell.auth.sign_pythonrsa import PythonRSASigner
 
+@functools.lru_cache(maxsize=None)
+def load_signer():
+    """Return the signer of the ADB key pair, creating the keys if needed."""
+
+    from adb_shell.auth.keygen import keygen
+    from adb_shell.auth.sign_pythonrsa import PythonRSASigner
 
-def set_signer():
     home = os.path.expanduser('~')
     keys_path = os.path.join(home, '.android')
     if not os.path.exists(keys_path):
@@ -1,16 +1,92 @@
-import portscan
+import asyncio
+import ipaddress
+import time
 
+import ifaddr
+
+from acestream_search.common.constants import ADB_DISCOVERY_CONCURRENCY
+from acestream_search.common.constants import ADB_DISCOVERY_MIN_PREFIX
+from acestream_search.common.constants import ADB_DISCOVERY_TIMEOUT
+from acestream_search.common.constants import ADB_KNOWN_DEVICES_TTL
+from acestream_search.common.constants import ADB_PORT
+from acestream_search.common.state import load_state
+from acestream_search.common.state import save_state
 from acestream_search.log import logger
 
 
-def discover_adb_devices():
-    local_ip = portscan.get_local_ip()
-    logger.info(f'Found local IP: {local_ip}')
-    network = '.'.join(local_ip.split('.')[:-1]) + '.0/24'
-    scanner = portscan.PortScan(network, '5555')
-    logger.info('Discovering ADB devices...')
-    open_port_discovered = scanner.run()
-    all_hosts = sorted([item[0] for item in open_port_discovered])
+def local_networks() -> list:
+    """Return the IPv4 networks of the local interfaces."""
+
+    networks = []
+    for adapter in ifaddr.get_adapters():
+        for address in adapter.ips:
+            # IPv6 addresses are (ip, flowinfo, scope_id) tuples
+            if not isinstance(address.ip, str):
+                continue
+            interface = ipaddress.IPv4Interface(
+                f'{address.ip}/'
+                f'{max(address.network_prefix, ADB_DISCOVERY_MIN_PREFIX)}'
+            )
+            if interface.ip.is_loopback or interface.ip.is_link_local:
+                continue
+            if interface.network not in networks:
+                networks.append(interface.network)
+    return networks
+
+
+async def probe_adb_port(ip: str, timeout=ADB_DISCOVERY_TIMEOUT) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(ip, ADB_PORT), timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def scan_adb_devices(
+    callback=None, concurrency=ADB_DISCOVERY_CONCURRENCY
+) -> list:
+    """Return the IPs with the ADB port open, known devices first."""
+
+    known = load_state('adb_devices').get('devices', {})
+    semaphore = asyncio.Semaphore(concurrency)
+    found = {}
+
+    async def probe(ip: str):
+        async with semaphore:
+            if not await probe_adb_port(ip):
+                return
+        found[ip] = time.time()
+        if callback:
+            callback(ip)
+
+    try:
+        await asyncio.gather(*(probe(ip) for ip in known))
+        networks = local_networks()
+        logger.info(
+            'Discovering ADB devices in '
+            f'{", ".join(str(n) for n in networks) or "no local network"}'
+        )
+        await asyncio.gather(*(
+            probe(str(host)) for network in networks
+            for host in network.hosts() if str(host) not in known
+        ))
+    finally:
+        limit = time.time() - ADB_KNOWN_DEVICES_TTL
+        save_state('adb_devices', {
+            'devices': {
+                ip: seen_at for ip, seen_at in {**known, **found}.items()
+                if seen_at >= limit
+            }
+        })
+
+    all_hosts = sorted(found, key=ipaddress.ip_address)
     if all_hosts:
         logger.info(f'Found ADB hosts: {", ".join(all_hosts)}')
     else:
@@ -19,3 +95,7 @@ def discover_adb_devices():
             'ADB debugging in your Android devices?'
         )
     return all_hosts
+
+
+def discover_adb_devices(callback=None) -> list:
+    return asyncio.run(scan_adb_devices(callback))
@@ -0,0 +1,73 @@
+import itertools
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from acestream_search.log import logger
+
+DispatchResult = namedtuple(
+    'DispatchResult', ['ip', 'link', 'outcome', 'latency']
+)
+
+
+class Dispatcher():
+    """Send links to several devices at once, one worker per device."""
+
+    def __init__(self, send, callback=None):
+        self.send = send
+        self.callback = callback
+        self.lock = threading.Lock()
+        self.queues = {}
+        self.latest = {}
+        self.sequence = itertools.count(1)
+
+    def _queue(self, ip: str) -> queue.Queue:
+        # Called with the lock held
+        if ip not in self.queues:
+            self.queues[ip] = queue.Queue()
+            threading.Thread(
+                target=self._worker, args=(ip, self.queues[ip]), daemon=True
+            ).start()
+        return self.queues[ip]
+
+    def dispatch(self, ips: list, link: str):
+        submitted_at = time.monotonic()
+        with self.lock:
+            for ip in dict.fromkeys(ips):
+                number = next(self.sequence)
+                self.latest[ip] = number
+                self._queue(ip).put((number, link, submitted_at))
+
+    def _worker(self, ip: str, requests: queue.Queue):
+        while True:
+            number, link, submitted_at = requests.get()
+            with self.lock:
+                superseded = number < self.latest[ip]
+            if superseded:
+                outcome = 'superseded'
+            else:
+                try:
+                    outcome = 'sent' if self.send(ip, link) else 'failed'
+                except Exception as e:
+                    logger.error(f'Error sending link to "{ip}": {e}')
+                    outcome = 'failed'
+            self._report(DispatchResult(
+                ip, link, outcome, time.monotonic() - submitted_at
+            ))
+
+    def _report(self, result: DispatchResult):
+        if result.outcome == 'sent':
+            logger.info(
+                f'Link sent to Android device {result.ip} '
+                f'in {result.latency:.2f}s'
+            )
+        elif result.outcome == 'failed':
+            logger.warning(
+                f'Not able to send the link to Android device {result.ip} '
+                f'({result.latency:.2f}s)'
+            )
+        else:
+            logger.debug(f'Dropped a superseded link for {result.ip}')
+        if self.callback:
+            self.callback(result)
@@ -1,42 +1,157 @@
+import hashlib
+import json
 import os
 import platform
-import subprocess
+import shutil
 import tempfile
 import zipfile
 
 import requests
 
+from acestream_search.common import transport
+from acestream_search.common.constants import ADB_DOWNLOAD_CHUNK_SIZE
+from acestream_search.common.paths import CACHE_DIR
 from acestream_search.log import logger
 
 BASE_URL = 'https://dl.google.com/android/repository/platform-tools-latest'
+ADB_CACHE_DIR = os.path.join(CACHE_DIR, 'adb')
+# adb.exe needs its DLLs next to it, nothing else in the archive is used
+ADB_FILES = {
+    'Darwin': ('adb',),
+    'Linux': ('adb',),
+    'Windows': ('adb.exe', 'AdbWinApi.dll', 'AdbWinUsbApi.dll')
+}
+
+
+def _manifest_path() -> str:
+    return os.path.join(ADB_CACHE_DIR, 'manifest.json')
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(ADB_DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_adb_binary() -> str:
+    """Return the cached platform-tools directory if it is still intact."""
+
+    try:
+        with open(_manifest_path(), encoding='utf-8') as f:
+            manifest = json.load(f)
+        adb_path = os.path.join(ADB_CACHE_DIR, manifest['version'])
+        for name, sha256 in manifest['files'].items():
+            path = os.path.join(adb_path, 'platform-tools', name)
+            if _file_sha256(path) != sha256:
+                return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if manifest.get('system') != platform.system():
+        return None
+    return adb_path
+
+
+def _download(url: str, path: str):
+    """Stream url to path, checking the size against Content-Length."""
+
+    size = 0
+    with transport.get(url, stream=True) as resp:
+        resp.raise_for_status()
+        with open(path, 'wb') as f:
+            for chunk in resp.iter_content(ADB_DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+        expected = resp.headers.get('Content-Length')
+    if expected and int(expected) != size:
+        raise ValueError(f'got {size} of {expected} bytes')
+
+
+def _archive_version(archive: zipfile.ZipFile) -> str:
+    properties = archive.read('platform-tools/source.properties')
+    for line in properties.decode('utf-8', 'replace').splitlines():
+        key, _, value = line.partition('=')
+        if key.strip() == 'Pkg.Revision' and value.strip():
+            return value.strip()
+    raise ValueError('no Pkg.Revision in source.properties')
+
+
+def _install(download_path: str, files: tuple) -> dict:
+    # Extracting checks the CRC of each file, corrupted ones raise
+    # BadZipFile, so only the files used are ever decompressed
+    with zipfile.ZipFile(download_path) as archive:
+        version = _archive_version(archive)
+        adb_path = os.path.join(ADB_CACHE_DIR, version)
+        temp_dir = tempfile.mkdtemp(dir=ADB_CACHE_DIR)
+        try:
+            for name in files:
+                archive.extract(f'platform-tools/{name}', temp_dir)
+            if platform.system() != 'Windows':
+                os.chmod(
+                    os.path.join(temp_dir, 'platform-tools', 'adb'), 0o755
+                )
+            shutil.rmtree(adb_path, ignore_errors=True)
+            os.replace(temp_dir, adb_path)
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+    return {
+        'system': platform.system(),
+        'version': version,
+        'files': {
+            name: _file_sha256(
+                os.path.join(adb_path, 'platform-tools', name)
+            ) for name in files
+        }
+    }
+
+
+def _remove_other_versions(version: str):
+    with os.scandir(ADB_CACHE_DIR) as it:
+        for entry in it:
+            if entry.is_dir() and entry.name != version:
+                shutil.rmtree(entry.path, ignore_errors=True)
 
 
 def download_adb_binary() -> str:
-    temp_dir = tempfile.mkdtemp()
-
-    binary_url = ''
-    if platform.system() == 'Darwin':
-        binary_url = f'{BASE_URL}-darwin.zip'
-    elif platform.system() == 'Linux':
-        binary_url = f'{BASE_URL}-linux.zip'
-    elif platform.system() == 'Windows':
-        binary_url = f'{BASE_URL}-windows.zip'
-
-    download_path = os.path.join(temp_dir, 'platform-tools-latest.zip')
-
-    logger.info('Downloading ADB binary to temp location')
-    b = requests.get(binary_url).content
-    with open(download_path, 'wb') as f:
-        f.write(b)
-
-    with zipfile.ZipFile(download_path, 'r') as zip_ref:
-        zip_ref.extractall(temp_dir)
-
-    if platform.system() != 'Windows':
-        subprocess.run(
-            ['chmod', '+x', os.path.join(temp_dir, 'platform-tools', 'adb')]
-        )
-
-    os.remove(download_path)
-    logger.info('ADB binary downloaded successfully')
-    return temp_dir
+    """Return a directory with platform-tools/adb, downloading it if needed."""
+
+    adb_path = cached_adb_binary()
+    if adb_path:
+        logger.debug(f'Using the cached ADB binary in "{adb_path}"')
+        return adb_path
+
+    system = platform.system()
+    if system not in ADB_FILES:
+        logger.error(f'ADB binary not available for "{system}"')
+        return None
+    binary_url = f'{BASE_URL}-{system.lower()}.zip'
+
+    logger.info('Downloading ADB binary')
+    download_path = None
+    try:
+        os.makedirs(ADB_CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=ADB_CACHE_DIR, suffix='.zip', delete=False
+        ) as f:
+            download_path = f.name
+        _download(binary_url, download_path)
+        manifest = _install(download_path, ADB_FILES[system])
+        with open(f'{_manifest_path()}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(f'{_manifest_path()}.tmp', _manifest_path())
+        _remove_other_versions(manifest['version'])
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile,
+            requests.RequestException) as e:
+        logger.error(f'Not able to download the ADB binary: {e}')
+        return None
+    finally:
+        if download_path and os.path.exists(download_path):
+            os.remove(download_path)
+
+    adb_path = os.path.join(ADB_CACHE_DIR, manifest['version'])
+    logger.info(
+        f'ADB binary {manifest["version"]} downloaded to "{adb_path}"'
+    )
+    return adb_path
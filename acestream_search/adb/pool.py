@@ -0,0 +1,99 @@
+import threading
+
+from acestream_search.adb.server import connect
+from acestream_search.common.constants import ADB_HEALTH_CHECK_INTERVAL
+from acestream_search.common.constants import ADB_HEALTH_CHECK_TIMEOUT
+from acestream_search.log import logger
+
+
+class DevicePool():
+    """Connected ADB devices, kept alive by a background health check."""
+
+    def __init__(self, interval=ADB_HEALTH_CHECK_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.devices = {}
+        self.device_locks = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _device_lock(self, ip: str) -> threading.Lock:
+        with self.lock:
+            return self.device_locks.setdefault(ip, threading.Lock())
+
+    def _start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._check_loop, daemon=True
+                )
+                self.thread.start()
+
+    def _connect(self, ip: str):
+        # Called with the device lock held
+        device = connect(ip)
+        with self.lock:
+            if device:
+                self.devices[ip] = device
+            else:
+                self.devices.pop(ip, None)
+        return device
+
+    def shell(self, ip: str, command: str) -> str:
+        """Run command on the device, reconnecting once if it fails."""
+
+        for _ in range(2):
+            with self._device_lock(ip):
+                device = self.devices.get(ip)
+                if device is None or not device.available:
+                    device = self._connect(ip)
+                if device is None:
+                    return None
+                try:
+                    output = device.shell(command)
+                except Exception as e:
+                    logger.warning(f'Lost connection to "{ip}": {e}')
+                    device.close()
+                    continue
+            self._start()
+            return output
+        return None
+
+    def _check(self, ip: str):
+        lock = self._device_lock(ip)
+        # A device busy with a command does not need a check
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            device = self.devices.get(ip)
+            if device is None:
+                return
+            if device.available:
+                try:
+                    device.shell(
+                        'true', transport_timeout_s=ADB_HEALTH_CHECK_TIMEOUT,
+                        read_timeout_s=ADB_HEALTH_CHECK_TIMEOUT
+                    )
+                    return
+                except Exception as e:
+                    logger.debug(f'Health check of "{ip}" failed: {e}')
+                    device.close()
+            logger.info(f'Reconnecting to Android device: {ip}')
+            self._connect(ip)
+        finally:
+            lock.release()
+
+    def _check_loop(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                ips = list(self.devices)
+            for ip in ips:
+                self._check(ip)
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            devices = list(self.devices.values())
+            self.devices.clear()
+        for device in devices:
+            device.close()
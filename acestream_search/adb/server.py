@@ -1,9 +1,9 @@
 import os
 import subprocess
 
-from adb_shell.adb_device import AdbDeviceTcp
-
-from acestream_search.adb.auth import set_signer
+from acestream_search.adb.auth import load_signer
+from acestream_search.common.constants import ADB_AUTH_TIMEOUT
+from acestream_search.common.constants import ADB_TRANSPORT_TIMEOUT
 from acestream_search.log import logger
 
 
@@ -21,15 +21,20 @@ def run_adb_command(adb_path: str, command: str) -> bool:
     return True
 
 
-def connect(ip: str) -> AdbDeviceTcp:
-    device = AdbDeviceTcp(ip)
-    signer = set_signer()
+def connect(ip: str):
+    # adb_shell is only imported once a device is actually used
+    from adb_shell.adb_device import AdbDeviceTcp
+
+    device = AdbDeviceTcp(
+        ip, default_transport_timeout_s=ADB_TRANSPORT_TIMEOUT
+    )
+    signer = load_signer()
     logger.info(
         f'Trying to connect to Adroid device: {ip} '
-        '(will timeout after 60s)'
+        f'(will timeout after {ADB_AUTH_TIMEOUT}s)'
     )
     try:
-        device.connect(rsa_keys=[signer], auth_timeout_s=60)
+        device.connect(rsa_keys=[signer], auth_timeout_s=ADB_AUTH_TIMEOUT)
     except Exception as e:
         logger.error(f'Error connecting to device: {e}')
         return None
@@ -1,60 +1,191 @@
 import json
 import re
+import threading
+import time
+import unicodedata
 from urllib.parse import urlparse
 
-import requests
-from bs4 import BeautifulSoup
-from tabulate import tabulate
-
+from acestream_search.common.constants import ACESTREAM_PREFIX
+from acestream_search.common.constants import CHANNELS_TTL
 from acestream_search.common.constants import CHANNELS_URL
+from acestream_search.common.ipfs import fetch_ipfs
+from acestream_search.common.ipfs import IPFS_PATH_PATTERN
+from acestream_search.common.parser import make_soup
+from acestream_search.common.state import load_state
+from acestream_search.common.state import save_state
 from acestream_search.log import logger
+from acestream_search.render import BOX_STYLES
+from acestream_search.render import render_channels
+
+SCRIPT_ARRAY_PATTERN = re.compile(r'<script[^>]*>[^<]*?=\s*\[')
 
 
-def get_channels_table(channels: list):
-    table = [[c['name'], c['link']] for c in channels]
+def get_channels_table(channels: list, output='table'):
+    table = render_channels(channels, output)
     if not table:
         logger.info('Nothing found')
-        return
+    return table
 
-    return tabulate(
-        table,
-        headers=['Channel', 'Acestream Link'],
-        tablefmt='fancy_grid',
-        stralign='center',
-        rowalign='center'
-    )
 
+def channel_key(text: str) -> str:
+    """Case and accent insensitive form of text used to match channels."""
+
+    return ''.join(
+        c for c in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(c)
+    ).casefold()
 
-def get_channels(url=CHANNELS_URL, include_android=False):
+
+def fetch_channels(url=CHANNELS_URL) -> list:
     logger.info('Searching for channels')
-    resp = requests.get(url)
-    resp.raise_for_status()
-    if resp.history:
-        new_url = 'https://' + urlparse(resp.url).netloc
-        logger.warning(
-            f'Source url has changed from "{url}" to "{new_url}"'
-        )
-        return get_channels(new_url, include_android)
-
-    main_sop = BeautifulSoup(resp.text, 'html.parser')
-    pattern = re.compile('https://ipfs.io/.+')
+    # Both pages are IPFS documents, served by the fastest gateway
+    text = fetch_ipfs(urlparse(url).path)
+
+    pattern = re.compile(r'^https?://[^/]+/ip[fn]s/.+')
+    main_sop = make_soup(text, {'a': {'href': pattern}})
     channels_url = main_sop.find(name='a', href=pattern)['href']
 
-    resp = requests.get(channels_url)
-    resp.raise_for_status()
-    channels_sop = BeautifulSoup(resp.text, 'html.parser')
+    text = fetch_ipfs(IPFS_PATH_PATTERN.search(channels_url).group())
+    channels = [c for c in extract_channels(text) if c is not None]
+    return sorted(channels, key=lambda x: x['name'])
+
+
+def _channel_record(obj: dict):
+    # Called for every decoded object, so only the channel fields are kept
+    url = obj.get('url')
+    name = obj.get('name')
+    if isinstance(url, str) and url.startswith(ACESTREAM_PREFIX) and name:
+        return {'name': name, 'link': url}
+    return None
+
+
+def extract_channels(text: str) -> list:
+    """Decode the channel array assigned in the first script of the page."""
+
+    match = SCRIPT_ARRAY_PATTERN.search(text)
+    if not match:
+        raise ValueError('No channel list found in the channels page')
+    decoder = json.JSONDecoder(object_hook=_channel_record)
+    channels, _ = decoder.raw_decode(text, match.end() - 1)
+    return channels
+
+
+def diff_channels(old: list, new: list) -> dict:
+    """Return the channels added, removed and with changed links."""
+
+    def links_by_name(channels):
+        links = {}
+        for channel in channels:
+            links.setdefault(channel['name'], set()).add(channel['link'])
+        return links
+
+    old_links = links_by_name(old)
+    new_links = links_by_name(new)
+    return {
+        'added': [c for c in new if c['name'] not in old_links],
+        'removed': [c for c in old if c['name'] not in new_links],
+        'changed': [
+            {
+                'name': name,
+                'added': sorted(links - old_links[name]),
+                'removed': sorted(old_links[name] - links)
+            } for name, links in sorted(new_links.items())
+            if name in old_links and links != old_links[name]
+        ]
+    }
+
+
+def filter_channels(channels: list, text: str, keys: list = None) -> list:
+    """Return the channels whose name contains every word of text."""
+
+    words = channel_key(text).split()
+    if not words:
+        return channels
+    keys = keys or [channel_key(c['name']) for c in channels]
+    return [
+        channel for channel, key in zip(channels, keys)
+        if all(word in key for word in words)
+    ]
+
+
+class ChannelList():
+    """Parsed channel list cached in memory and on disk for ttl seconds."""
+
+    def __init__(self, url=CHANNELS_URL, ttl=CHANNELS_TTL):
+        self.url = url
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.channels = []
+        self.keys = []
+        self.updated_at = 0
+        self.diff = None
+
+    def _set(self, channels: list, updated_at: float):
+        self.channels = channels
+        self.keys = [channel_key(c['name']) for c in channels]
+        self.updated_at = updated_at
+
+    def load(self, max_age=None):
+        """Return the channels and their keys, fetching them if needed."""
+
+        max_age = self.ttl if max_age is None else max_age
+        with self.lock:
+            now = time.time()
+            if now - self.updated_at >= max_age:
+                state = load_state('channels')
+                if now - state.get('updated_at', 0) < max_age:
+                    logger.info('Using the cached channel list')
+                    self._set(state['channels'], state['updated_at'])
+                    self.diff = state.get('diff')
+                else:
+                    previous = self.channels or state.get('channels')
+                    self._set(fetch_channels(self.url), now)
+                    self.diff = diff_channels(
+                        previous, self.channels
+                    ) if previous else None
+                    save_state('channels', {
+                        'updated_at': now,
+                        'channels': self.channels,
+                        'diff': self.diff
+                    })
+            return self.channels, self.keys
+
+    def search(self, text: str, max_age=None) -> list:
+        channels, keys = self.load(max_age)
+        return filter_channels(channels, text, keys)
+
+
+channel_list = ChannelList()
 
-    pattern = re.compile('acestream://.+')
+
+def get_channels(include_android=False, search='', max_age=None):
     android = ' (Play on Android)' if include_android else ''
+    return [
+        {'name': c['name'], 'link': f'{c["link"]}{android}'}
+        for c in channel_list.search(search, max_age)
+    ]
+
+
+def get_channels_diff(max_age=None) -> dict:
+    channel_list.load(max_age)
+    return channel_list.diff
+
 
-    links = json.loads(
-        channels_sop.find(name='script').text.split('=')[1].split(';')[0]
+def run(search: str, output='table', max_age=None, diff=False):
+    if diff:
+        channels_diff = get_channels_diff(max_age)
+        if channels_diff is None:
+            logger.info('No previous channel list to compare with')
+            return
+        print(json.dumps(channels_diff, ensure_ascii=False, indent=2))
+        return
+
+    channels_table = get_channels_table(
+        get_channels(search=search, max_age=max_age), output
     )
+    if not channels_table:
+        return
 
-    channels = [
-        {
-            'name': link['name'],
-            'link': f'{link['url']}{android}'
-        } for link in links if pattern.match(link['url'])
-    ]
-    return sorted(channels, key=lambda x: x['name'])
+    if output in BOX_STYLES:
+        print('')
+    print(channels_table)
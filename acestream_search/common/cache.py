@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from acestream_search.common.constants import HTTP_CACHE_MAX_SIZE
+from acestream_search.common.constants import HTTP_CACHE_TTLS
+from acestream_search.common.paths import CACHE_DIR
+from acestream_search.log import logger
+
+
+class HttpCache():
+    """On-disk cache of HTTP responses with TTLs and LRU eviction."""
+
+    def __init__(
+        self, path=os.path.join(CACHE_DIR, 'http'),
+        max_size=HTTP_CACHE_MAX_SIZE
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.enabled = True
+        self.max_age = None
+        self.size = None
+        self.lock = threading.Lock()
+
+    def configure(self, enabled=True, max_age=None):
+        self.enabled = enabled
+        self.max_age = max_age
+
+    def _entry_path(self, url: str) -> str:
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.path, f'{key}.json')
+
+    def get(self, url: str):
+        if not self.enabled:
+            return None
+        entry_path = self._entry_path(url)
+        try:
+            with open(entry_path, encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def is_fresh(self, entry: dict, resource: str) -> bool:
+        ttl = self.max_age
+        if ttl is None:
+            ttl = HTTP_CACHE_TTLS[resource]
+        return time.time() - entry['stored_at'] < ttl
+
+    @staticmethod
+    def revalidation_headers(entry: dict) -> dict:
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url: str, entry: dict):
+        if not self.enabled:
+            return
+        entry = dict(entry, url=url, stored_at=time.time())
+        entry_path = self._entry_path(url)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            data = json.dumps(entry).encode('utf-8')
+            temp_path = f'{entry_path}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            previous_size = (
+                os.path.getsize(entry_path)
+                if os.path.exists(entry_path) else 0
+            )
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            logger.warning(f'Not able to write to the cache: {e}')
+            return
+        with self.lock:
+            if self.size is None:
+                self.size = self._disk_usage()
+            else:
+                self.size += len(data) - previous_size
+            if self.size > self.max_size:
+                self._evict()
+
+    def _entries(self):
+        try:
+            with os.scandir(self.path) as it:
+                return [
+                    (e.stat().st_mtime, e.stat().st_size, e.path)
+                    for e in it if e.name.endswith('.json')
+                ]
+        except OSError:
+            return []
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Drop down to 90% of the limit so a full cache does not need
+        # an eviction pass on every write
+        target = self.max_size * 0.9
+        for _, size, path in sorted(self._entries()):
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def clear(self):
+        with self.lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.size = 0
+
+
+http_cache = HttpCache()
@@ -1,6 +1,74 @@
 EVENTS_URL = 'https://livetv.sx'
 ALTERNATIVE_EVENTS_URL = 'https://livetv902.me'
 CHANNELS_URL = 'https://ipfs.io/ipns/elcano.top'
+ACESTREAM_PREFIX = 'acestream://'
+CHANNELS_TTL = 3600
+# Public gateways are listed without scheme so that update-urls.sh, which
+# rewrites the urls found in this file, leaves them alone
+IPFS_LOCAL_GATEWAY = 'http://127.0.0.1:8080'
+IPFS_PUBLIC_GATEWAYS = ('ipfs.io', 'dweb.link', 'w3s.link')
+
+BOOTSTRAP_CONNECT_TIMEOUT = 3
+MIRROR_CANDIDATES = 20
+MIRROR_CONCURRENCY = 10
+MIRROR_TTL = 6 * 3600
+MIRROR_MIN_SCORE = 0.5
+MIRROR_HEALTH_DECAY = 0.7
+
+CATEGORY_CONCURRENCY = 10
+OUTPUT_FORMATS = ('table', 'grid', 'json', 'csv', 'm3u', 'ndjson')
+STARTED_EVENTS_HOURS = 3
+STORE_LINKS_TTL = 300
+INDEX_TTL = 300
+INDEX_LINKS_TTL = 60
+WATCH_SWEEP_INTERVAL = 900
+WATCH_MIN_INTERVAL = 60
+WATCH_MAX_INTERVAL = 900
+WATCH_BACKOFF_FACTOR = 4
+
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8000
+SERVE_HOURS = 24
+SERVE_INTERVAL = 300
+SERVE_WAIT_TIMEOUT = 120
+
+GUI_UPDATE_INTERVAL = 50
+GUI_UPDATE_BATCH = 200
+
+ADB_PORT = 5555
+ADB_DISCOVERY_CONCURRENCY = 256
+ADB_DISCOVERY_TIMEOUT = 0.5
+# Larger networks are only scanned in the /20 around the interface IP
+ADB_DISCOVERY_MIN_PREFIX = 20
+ADB_KNOWN_DEVICES_TTL = 30 * 24 * 3600
+ADB_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Accepting the key on the device the first time can take a while
+ADB_AUTH_TIMEOUT = 60
+ADB_TRANSPORT_TIMEOUT = 5
+ADB_HEALTH_CHECK_INTERVAL = 30
+ADB_HEALTH_CHECK_TIMEOUT = 5
+
+HTML_PARSERS = ('lxml', 'html.parser')
+
+HTTP_CACHE_MAX_SIZE = 100 * 1024 * 1024
+HTTP_CACHE_TTLS = {
+    'events': 60,
+    'listings': 300,
+    'timezone': 24 * 3600
+}
+
+HTTP_TIMEOUT = 10
+HTTP_CONNECTIONS = 10
+HTTP_POOL_SIZE = 20
+HTTP_KEEPALIVE_TIMEOUT = 30
+HTTP_DNS_CACHE_TTL = 300
+HTTP_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:131.0) '
+        'Gecko/20100101 Firefox/131.0'
+    ),
+    'Accept-Encoding': 'gzip, deflate'
+}
 
 CATEGORIES = {
     'american_football': 27,
@@ -0,0 +1,91 @@
+import os
+import queue
+import re
+import threading
+
+import requests
+
+from acestream_search.common import transport
+from acestream_search.common.cache import HttpCache
+from acestream_search.common.constants import IPFS_LOCAL_GATEWAY
+from acestream_search.common.constants import IPFS_PUBLIC_GATEWAYS
+from acestream_search.common.paths import CACHE_DIR
+from acestream_search.log import logger
+
+CID_PATTERN = re.compile(r'\b(Qm[1-9A-HJ-NP-Za-km-z]{44}|b[a-z2-7]{58,})\b')
+IPFS_PATH_PATTERN = re.compile(r'/ip[fn]s/[^?#]+')
+
+gateways = [
+    IPFS_LOCAL_GATEWAY,
+    *(f'https://{host}' for host in IPFS_PUBLIC_GATEWAYS)
+]
+# Content under a CID never changes, so entries are only ever evicted
+ipfs_cache = HttpCache(os.path.join(CACHE_DIR, 'ipfs'))
+
+
+def configure_gateways(urls: list):
+    global gateways
+
+    gateways = [url.rstrip('/') for url in urls]
+
+
+def response_cid(headers) -> str:
+    """Return the CID of the document served, if the gateway tells it."""
+
+    roots = headers.get('X-Ipfs-Roots')
+    if roots:
+        return roots.split(',')[-1].strip()
+    match = CID_PATTERN.search(headers.get('ETag') or '')
+    return match.group(1) if match else None
+
+
+def is_gateway_response(headers) -> bool:
+    """Tell whether a response comes from an IPFS gateway."""
+
+    return bool(headers.get('X-Ipfs-Path') or headers.get('X-Ipfs-Roots'))
+
+
+def _race(method: str, path: str):
+    """Send the request to every gateway, the first valid response wins."""
+
+    session = transport.get_session()
+    results = queue.Queue()
+
+    def request(gateway):
+        try:
+            results.put((gateway, session.request(method, f'{gateway}{path}')))
+        except requests.RequestException as e:
+            results.put((gateway, e))
+
+    for gateway in gateways:
+        threading.Thread(target=request, args=(gateway,), daemon=True).start()
+    for _ in gateways:
+        gateway, resp = results.get()
+        if isinstance(resp, Exception):
+            logger.debug(f'IPFS gateway "{gateway}" failed: {resp}')
+        elif not is_gateway_response(resp.headers):
+            logger.debug(f'"{gateway}" is not an IPFS gateway, ignored')
+        elif resp.ok and (method == 'HEAD' or resp.content):
+            return gateway, resp
+    raise requests.ConnectionError(f'No IPFS gateway could serve "{path}"')
+
+
+def fetch_ipfs(path: str) -> str:
+    """GET an /ipfs/ or /ipns/ path from the fastest gateway."""
+
+    key = path if path.startswith('/ipfs/') else None
+    if key is None:
+        _, resp = _race('HEAD', path)
+        cid = response_cid(resp.headers)
+        key = f'/ipfs/{cid}' if cid else None
+    entry = ipfs_cache.get(key) if key else None
+    if entry:
+        transport.stats.add(cached=1)
+        return entry['text']
+
+    gateway, resp = _race('GET', key or path)
+    logger.info(f'Fetched "{path}" from IPFS gateway "{gateway}"')
+    cid = response_cid(resp.headers)
+    for cache_key in {key, f'/ipfs/{cid}' if cid else None} - {None}:
+        ipfs_cache.put(cache_key, {'text': resp.text})
+    return resp.text
@@ -0,0 +1,66 @@
+import importlib.util
+import re
+
+from bs4 import BeautifulSoup
+from bs4.filter import ElementFilter
+
+from acestream_search.common.constants import HTML_PARSERS
+from acestream_search.log import logger
+
+parser = next(
+    name for name in HTML_PARSERS
+    if name == 'html.parser' or importlib.util.find_spec(name)
+)
+
+
+def set_parser(name: str):
+    global parser
+
+    if name not in HTML_PARSERS:
+        raise ValueError(f'"{name}" is not a supported HTML parser')
+    if name != 'html.parser' and not importlib.util.find_spec(name):
+        logger.warning(
+            f'HTML parser "{name}" is not installed. '
+            f'Using "{parser}" instead.'
+        )
+        return
+    parser = name
+
+
+class TagFilter(ElementFilter):
+    """Only build the tags matching one of the given rules."""
+
+    def __init__(self, rules: dict):
+        super().__init__()
+        self.rules = rules
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        if name not in self.rules:
+            return False
+        attrs = attrs or {}
+        for attr, expected in self.rules[name].items():
+            value = attrs.get(attr)
+            if value is None:
+                return False
+            if isinstance(value, list):
+                value = ' '.join(value)
+            if expected is True:
+                continue
+            if isinstance(expected, re.Pattern):
+                if not expected.search(value):
+                    return False
+            elif attr == 'class':
+                if expected not in value.split():
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+    def allow_string_creation(self, string: str) -> bool:
+        return False
+
+
+def make_soup(markup: str, rules: dict = None) -> BeautifulSoup:
+    return BeautifulSoup(
+        markup, parser, parse_only=TagFilter(rules) if rules else None
+    )
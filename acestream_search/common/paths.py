@@ -0,0 +1,16 @@
+import os
+import platform
+
+
+def _user_dir(kind: str, env_var: str, *default: str) -> str:
+    if platform.system() == 'Windows':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'acestream-search', kind)
+    base = os.environ.get(env_var) or os.path.join(
+        os.path.expanduser('~'), *default
+    )
+    return os.path.join(base, 'acestream-search')
+
+
+CACHE_DIR = _user_dir('cache', 'XDG_CACHE_HOME', '.cache')
+STATE_DIR = _user_dir('state', 'XDG_STATE_HOME', '.local', 'state')
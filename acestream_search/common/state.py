@@ -0,0 +1,29 @@
+import json
+import os
+
+from acestream_search.common.paths import STATE_DIR
+from acestream_search.log import logger
+
+
+def _state_path(name: str) -> str:
+    return os.path.join(STATE_DIR, f'{name}.json')
+
+
+def load_state(name: str) -> dict:
+    try:
+        with open(_state_path(name), encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def save_state(name: str, state: dict):
+    path = _state_path(name)
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(f'{path}.tmp', path)
+    except OSError as e:
+        logger.warning(f'Not able to save the {name} state: {e}')
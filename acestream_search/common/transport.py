@@ -0,0 +1,211 @@
+import socket
+import threading
+from collections import namedtuple
+
+import aiohttp
+import requests
+from aiohttp.abc import AbstractResolver
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.connectionpool import HTTPSConnectionPool
+
+from acestream_search.common.cache import http_cache
+from acestream_search.common.constants import HTTP_CONNECTIONS
+from acestream_search.common.constants import HTTP_DNS_CACHE_TTL
+from acestream_search.common.constants import HTTP_HEADERS
+from acestream_search.common.constants import HTTP_KEEPALIVE_TIMEOUT
+from acestream_search.common.constants import HTTP_POOL_SIZE
+from acestream_search.common.constants import HTTP_TIMEOUT
+
+
+class TransportStats():
+    """Counters shared by the sync and async transports."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.cached = 0
+
+    def add(self, requests=0, connections=0, cached=0):
+        with self.lock:
+            self.requests += requests
+            self.connections += connections
+            self.cached += cached
+
+    def snapshot(self) -> tuple:
+        with self.lock:
+            return self.requests, self.connections, self.cached
+
+    def summary(self, since=(0, 0, 0)) -> str:
+        requests, connections, cached = (
+            now - before for now, before in zip(self.snapshot(), since)
+        )
+        reused = max(requests - connections, 0)
+        return (
+            f'{requests} HTTP requests over {connections} '
+            f'connections ({reused} reused), '
+            f'{cached} pages served from the cache'
+        )
+
+
+Page = namedtuple('Page', ['url', 'status', 'text', 'redirected'])
+
+
+stats = TransportStats()
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        stats.add(connections=1)
+        return super()._new_conn()
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        stats.add(connections=1)
+        return super()._new_conn()
+
+
+class TransportAdapter(HTTPAdapter):
+    """HTTPAdapter applying a default timeout and counting connections."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool
+        }
+
+    def send(self, request, timeout=None, **kwargs):
+        stats.add(requests=1)
+        return super().send(
+            request, timeout=timeout or self.timeout, **kwargs
+        )
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(HTTP_HEADERS)
+            adapter = TransportAdapter(
+                pool_connections=HTTP_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_SIZE
+            )
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return get_session().get(url, **kwargs)
+
+
+async def _on_request_start(session, context, params):
+    stats.add(requests=1)
+
+
+async def _on_connection_create_end(session, context, params):
+    stats.add(connections=1)
+
+
+class PinnedResolver(AbstractResolver):
+    """aiohttp resolver answering pinned hosts without any DNS lookup."""
+
+    def __init__(self):
+        self.pinned = {}
+        self.default = aiohttp.DefaultResolver()
+
+    def pin(self, host: str, ips: list):
+        self.pinned[host] = ips
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        if host not in self.pinned:
+            return await self.default.resolve(host, port, family)
+        return [
+            {
+                'hostname': host, 'host': ip, 'port': port,
+                'family': socket.AF_INET, 'proto': 0,
+                'flags': socket.AI_NUMERICHOST
+            } for ip in self.pinned[host]
+        ]
+
+    async def close(self):
+        await self.default.close()
+
+
+def client_session(resolver=None, **kwargs) -> aiohttp.ClientSession:
+    """Return an aiohttp session sharing the transport policy."""
+
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_CONNECTIONS * HTTP_POOL_SIZE,
+        limit_per_host=HTTP_POOL_SIZE,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        resolver=resolver
+    )
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=HTTP_HEADERS,
+        timeout=aiohttp.ClientTimeout(
+            total=None, sock_connect=HTTP_TIMEOUT, sock_read=HTTP_TIMEOUT
+        ),
+        trace_configs=[trace_config],
+        **kwargs
+    )
+
+
+def _page_from_entry(entry: dict) -> Page:
+    stats.add(cached=1)
+    return Page(
+        entry['final_url'], entry['status'],
+        entry['text'], entry['redirected']
+    )
+
+
+def _store_page(url: str, page: Page, headers):
+    http_cache.put(url, {
+        'final_url': page.url,
+        'status': page.status,
+        'text': page.text,
+        'redirected': page.redirected,
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified')
+    })
+
+
+async def fetch_async(
+    session: aiohttp.ClientSession, url: str, resource: str, **kwargs
+) -> Page:
+    """GET a page through the HTTP cache, raising on error statuses."""
+
+    entry = http_cache.get(url)
+    if entry and http_cache.is_fresh(entry, resource):
+        return _page_from_entry(entry)
+    async with session.get(
+        url, headers=http_cache.revalidation_headers(entry), **kwargs
+    ) as resp:
+        if resp.status == 304 and entry:
+            http_cache.put(url, entry)
+            return _page_from_entry(entry)
+        resp.raise_for_status()
+        page = Page(
+            str(resp.url), resp.status,
+            await resp.text(), bool(resp.history)
+        )
+        _store_page(url, page, resp.headers)
+    return page
@@ -1,53 +1,111 @@
 import asyncio
 import datetime
+import html
+import itertools
 import re
 import socket
+import time
 from urllib.parse import urlparse
 from zoneinfo import ZoneInfo
 
 import aiohttp
-import requests
 from bs4 import BeautifulSoup
 from dateutil.parser import parse as date_parse
-from dns import resolver
-from tabulate import tabulate
 
+from acestream_search.common import transport
 from acestream_search.common.constants import ALTERNATIVE_EVENTS_URL
+from acestream_search.common.constants import BOOTSTRAP_CONNECT_TIMEOUT
 from acestream_search.common.constants import CATEGORIES
+from acestream_search.common.constants import CATEGORY_CONCURRENCY
 from acestream_search.common.constants import EVENTS_URL
+from acestream_search.common.constants import HTTP_CACHE_TTLS
+from acestream_search.common.constants import HTTP_TIMEOUT
+from acestream_search.common.constants import MIRROR_CANDIDATES
+from acestream_search.common.constants import MIRROR_CONCURRENCY
+from acestream_search.common.constants import MIRROR_HEALTH_DECAY
+from acestream_search.common.constants import MIRROR_MIN_SCORE
+from acestream_search.common.constants import MIRROR_TTL
+from acestream_search.common.constants import STARTED_EVENTS_HOURS
+from acestream_search.common.constants import STORE_LINKS_TTL
+from acestream_search.common.constants import WATCH_BACKOFF_FACTOR
+from acestream_search.common.constants import WATCH_MAX_INTERVAL
+from acestream_search.common.constants import WATCH_MIN_INTERVAL
+from acestream_search.common.constants import WATCH_SWEEP_INTERVAL
+from acestream_search.common.parser import make_soup
+from acestream_search.common.state import load_state
+from acestream_search.common.state import save_state
+from acestream_search.events.index import EventIndex
 from acestream_search.log import logger
+from acestream_search.render import BOX_STYLES
+from acestream_search.render import event_to_json
+from acestream_search.render import EventWriter
+from acestream_search.render import render_events
+from acestream_search.store import EventStore
+
+ACESTREAM_PATTERN = re.compile('acestream://')
+ANCHORS_PATTERN = re.compile(r'[\^$]|\\[AZ]')
+ROW_PATTERN = re.compile(r'(?=<tr[\s>])', re.IGNORECASE)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+LIVE_RULES = {'a': {'class': 'live'}}
+LISTING_RULES = {
+    'a': {'class': 'live'},
+    'img': {'alt': True},
+    'span': {'class': 'evdesc'}
+}
+LINKS_RULES = {
+    'a': {'href': ACESTREAM_PATTERN},
+    'img': {'title': True},
+    'td': {'class': 'bitrate'}
+}
+TIMEZONE_RULES = {
+    'a': {'class': 'small', 'href': '/enx/userinfoedit/#timezone'}
+}
 
 source_url = EVENTS_URL
+mirror_candidates = MIRROR_CANDIDATES
+mirror_concurrency = MIRROR_CONCURRENCY
 
 
-def switch_source_url():
+class SourceError(aiohttp.ClientError):
+    """The source url answered with something else than an events page."""
+
+
+def configure_mirrors(candidates: int, concurrency: int):
+    global mirror_candidates, mirror_concurrency
+
+    mirror_candidates = candidates
+    mirror_concurrency = concurrency
+
+
+async def switch_source_url(session):
     global source_url
 
     candidate_url = ALTERNATIVE_EVENTS_URL
     logger.warning(f'Not able to connect to main url: {EVENTS_URL}')
 
-    working_url = _validate_alternative_url(candidate_url)
-    if working_url:
-        source_url = working_url
-        logger.info(f'Using alternative url: {source_url}')
-        return
-
-    logger.warning(
-        f'Alternative url {candidate_url} is unavailable or returned 403/502. '
-        'Trying the next numeric alternatives.'
+    working = await _race_alternative_urls(
+        session,
+        _alternative_url_candidates(candidate_url, mirror_candidates),
+        mirror_concurrency
     )
-    logger.warning(
-        'Please update the application to the latest '
-        'version to avoid this issue.'
-    )
-    incremented_url = _try_incremental_alternative_urls(candidate_url)
-    if incremented_url:
-        source_url = incremented_url
+    if working:
+        working_url, text = working
+        if urlparse(working_url).netloc != urlparse(candidate_url).netloc:
+            logger.warning(
+                f'Alternative url {candidate_url} is unavailable or '
+                f'returned 403/502. Found {working_url} instead.'
+            )
+            logger.warning(
+                'Please update the application to the latest '
+                'version to avoid this issue.'
+            )
+        source_url = working_url
         logger.info(f'Using alternative url: {source_url}')
-        return
+        return True, text
 
     source_url = candidate_url
     logger.info(f'Using alternative url: {candidate_url}')
+    return False, None
 
 
 def _normalize_url_base(url: str) -> str:
@@ -55,56 +113,73 @@ def _normalize_url_base(url: str) -> str:
     return f'{parsed.scheme}://{parsed.netloc}'
 
 
-def _is_valid_alternative_response(response):
-    if response.status_code != 200:
-        return False
-    if 'Error. Page cannot be displayed' in response.text:
+def _is_valid_source_page(text: str) -> bool:
+    if 'Error. Page cannot be displayed' in text:
         return False
 
-    sop = BeautifulSoup(response.text, 'html.parser')
+    sop = make_soup(text, LIVE_RULES)
     return bool(sop.find(name='a', attrs={'class': 'live'}))
 
 
-def _validate_alternative_url(url):
-    try:
-        response = requests.get(
-            f'{url}/enx/', timeout=3, allow_redirects=True
-        )
-        if _is_valid_alternative_response(response):
-            return _normalize_url_base(response.url)
-        return None
-    except Exception:
-        return None
+def _is_valid_alternative_response(status: int, text: str):
+    return status == 200 and _is_valid_source_page(text)
 
 
-def _try_incremental_alternative_urls(url, max_retries=20):
+def _alternative_url_candidates(url: str, count: int) -> list:
     match = re.match(r'^(https?://)([a-zA-Z]+)(\d+)(\..+)$', url)
     if not match:
-        return None
+        return [url]
 
     protocol, base_name, number, extension = match.groups()
     number = int(number)
 
-    for retry in range(1, max_retries + 1):
-        candidate_url = f'{protocol}{base_name}{number + retry}{extension}'
+    return [url] + [
+        f'{protocol}{base_name}{number + offset}{extension}'
+        for offset in range(1, count + 1)
+    ]
+
+
+async def _validate_alternative_url(session, semaphore, url: str):
+    async with semaphore:
         try:
-            response = requests.get(
-                f'{candidate_url}/enx/',
-                timeout=3,
-                allow_redirects=True
-            )
-            if _is_valid_alternative_response(response):
-                return _normalize_url_base(response.url)
-        except Exception:
-            continue
+            async with session.get(
+                f'{url}/enx/', timeout=aiohttp.ClientTimeout(total=3)
+            ) as resp:
+                # Parked domains often serve pages in other encodings
+                text = await resp.text(errors='replace')
+                if _is_valid_alternative_response(resp.status, text):
+                    return _normalize_url_base(str(resp.url)), text
+        except (aiohttp.ClientError, asyncio.TimeoutError, LookupError):
+            # LookupError is an unknown charset in the Content-Type
+            pass
+    return None
+
+
+async def _race_alternative_urls(
+    session, candidate_urls: list, concurrency: int
+):
+    """Probe the candidates concurrently and return the first valid one."""
 
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        asyncio.ensure_future(
+            _validate_alternative_url(session, semaphore, url)
+        ) for url in candidate_urls
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            working = await next_done
+            if working:
+                return working
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
     return None
 
 
-def get_events_timezone():
-    test_request = requests.get(f'{source_url}/enx/')
-    test_request.raise_for_status()
-    sop = BeautifulSoup(test_request.text, 'html.parser')
+def parse_events_timezone(text: str):
+    sop = make_soup(text, TIMEZONE_RULES)
     try:
         server_time_offset = sop.find(
             attrs={
@@ -112,190 +187,356 @@ def get_events_timezone():
                 'href': '/enx/userinfoedit/#timezone'
             }
         ).text.split('UTC')[-1].strip() or '0'
-        tz = datetime.timezone(
+        return datetime.timezone(
             datetime.timedelta(hours=float(server_time_offset))
         )
-        return tz
     except Exception:
-        logger.warning(
-            'Not able to retrieve events time zone from the server. '
-            'Assuming Europe/London time zone.'
-        )
-        return datetime.timezone(
-            datetime.datetime.now(
-                tz=ZoneInfo('Europe/London')
-            ).utcoffset()
-        )
+        return None
 
 
-def set_source_url():
+def _resolve_host(host: str) -> list:
+    # Only needed when the cached addresses are stale, dnspython is slow to
+    # import
+    from dns import resolver
+
     res = resolver.Resolver(configure=False)
     res.nameservers = ['1.1.1.1', '1.0.0.1']
+    return list(res.resolve_name(host, socket.AF_INET).addresses())
+
+
+async def probe_source_url(session, pinned_resolver):
+    """Set source_url to the main url or a working alternative."""
+
+    global source_url
+
+    host = urlparse(EVENTS_URL).hostname
     try:
-        ips = list(
-            res.resolve_name(
-                EVENTS_URL.split('//')[1], socket.AF_INET
-            ).addresses()
-        )
+        ips = await asyncio.to_thread(_resolve_host, host)
+        pinned_resolver.pin(host, ips)
+        async with session.get(
+            f'{EVENTS_URL}/enx/',
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=BOOTSTRAP_CONNECT_TIMEOUT,
+                sock_read=HTTP_TIMEOUT
+            )
+        ) as resp:
+            resp.raise_for_status()
+            text = await resp.text()
+            if not _is_valid_source_page(text):
+                raise SourceError(f'{EVENTS_URL} is not an events page')
+            source_url = _normalize_url_base(str(resp.url))
     except Exception:
-        switch_source_url()
-        return
+        return await switch_source_url(session)
+
+    if source_url != EVENTS_URL:
+        logger.warning(
+            f'Source url has changed from "{EVENTS_URL}" to "{source_url}"'
+        )
+    logger.info(f'Using main url: {source_url}')
+    return True, text
 
-    ip = ips[0]
 
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+def _is_mirror_healthy(state: dict, url: str) -> bool:
+    health = state.get('mirrors', {}).get(url)
+    if not health:
+        return False
+    if time.time() - state.get('checked_at', 0) > MIRROR_TTL:
+        return False
+    return health['score'] >= MIRROR_MIN_SCORE
+
+
+def record_mirror_health(url: str, ok: bool, probed=False):
+    """Update the health score of a mirror in the mirror state file."""
+
+    state = load_state('mirror')
+    mirrors = state.setdefault('mirrors', {})
+    health = mirrors.setdefault(
+        url, {'score': 1.0, 'successes': 0, 'failures': 0}
+    )
+    health['score'] = round(
+        MIRROR_HEALTH_DECAY * health['score']
+        + (1 - MIRROR_HEALTH_DECAY) * ok, 3
+    )
+    now = time.time()
+    if ok:
+        health['successes'] += 1
+        health['last_success'] = now
+        if probed or url != state.get('url'):
+            state['checked_at'] = now
+        state['url'] = url
+    else:
+        health['failures'] += 1
+        health['last_failure'] = now
+        if health['score'] < MIRROR_MIN_SCORE and url == state.get('url'):
+            state['url'] = None
+    save_state('mirror', state)
+
+
+def _cached_events_timezone():
+    cached = load_state('mirror').get('timezone') or {}
+    if cached.get('url') != source_url:
+        return None
+    age = time.time() - cached.get('checked_at', 0)
+    if age > HTTP_CACHE_TTLS['timezone']:
+        return None
+    return datetime.timezone(datetime.timedelta(seconds=cached['offset']))
+
+
+def _save_events_timezone(tz: datetime.timezone):
+    state = load_state('mirror')
+    state['timezone'] = {
+        'url': source_url,
+        'offset': tz.utcoffset(None).total_seconds(),
+        'checked_at': time.time()
+    }
+    save_state('mirror', state)
+
+
+async def _probe_and_record(session, pinned_resolver):
+    validated, text = await probe_source_url(session, pinned_resolver)
+    if validated:
+        record_mirror_health(source_url, True, probed=True)
+        state = load_state('mirror')
+        state['addresses'] = pinned_resolver.pinned
+        save_state('mirror', state)
+    return validated, text
+
+
+class SourceRecovery():
+    """Probe for a new source url, once per run, when the current one fails."""
+
+    def __init__(self, session, pinned_resolver):
+        self.session = session
+        self.pinned_resolver = pinned_resolver
+        self.lock = asyncio.Lock()
+        self.probed = False
+        self.validated = False
+
+    async def recover(self, failed_url: str) -> bool:
+        async with self.lock:
+            if source_url != failed_url:
+                return True
+            if not self.probed:
+                self.probed = True
+                logger.warning(f'"{failed_url}" is not working, probing again')
+                record_mirror_health(failed_url, False)
+                state = load_state('mirror')
+                if state.get('url') == failed_url:
+                    state['url'] = None
+                    save_state('mirror', state)
+                self.validated, _ = await _probe_and_record(
+                    self.session, self.pinned_resolver
+                )
+            return self.validated
+
+    async def fetch(self, fetch_page):
+        """Await fetch_page(), fetching again if the source url failed."""
+
+        failed_url = source_url
+        error = None
         try:
-            s.settimeout(1)
-            s.connect((ip, 443))
-            test_request = requests.get(f'{EVENTS_URL}/enx/allupcomingsports/')
-            test_request.raise_for_status()
-            logger.info(f'Using main url: {EVENTS_URL}')
-        except Exception:
-            switch_source_url()
-        finally:
-            s.close()
-
-
-def get_events_table(events: list):
-    table = [
-        [
-            e['title'], e['category'],
-            *get_events_extra_columns(e)
-        ] for e in sorted(
-            events, key=lambda x: (x['date'], x['category'], x['title'])
-        ) if e['links']
-    ]
+            page = await fetch_page()
+        except aiohttp.ClientResponseError as e:
+            if e.status != 403 and e.status < 500:
+                raise
+            error = e
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            error = e
+        else:
+            if _is_valid_source_page(page.text):
+                return page
+        if not await self.recover(failed_url):
+            raise error or SourceError(
+                f'{failed_url} did not return an events page'
+            )
+        # A probe validating the same url means the page is really empty
+        if error is None and source_url == failed_url:
+            return page
+        return await fetch_page()
+
+
+async def bootstrap(
+    session, pinned_resolver, recovery: SourceRecovery
+) -> datetime.timezone:
+    """Select the source url and return the events timezone."""
+
+    global source_url
+
+    text = None
+    state = load_state('mirror')
+    url = state.get('url')
+    if url and _is_mirror_healthy(state, url):
+        source_url = url
+        for host, ips in state.get('addresses', {}).items():
+            pinned_resolver.pin(host, ips)
+        logger.info(f'Using last working url: {url}')
+    else:
+        _, text = await _probe_and_record(session, pinned_resolver)
+
+    if text is None:
+        events_timezone = _cached_events_timezone()
+        if events_timezone:
+            return events_timezone
+        page = await recovery.fetch(
+            lambda: transport.fetch_async(
+                session, f'{source_url}/enx/', 'timezone'
+            )
+        )
+        text = page.text
+
+    events_timezone = parse_events_timezone(text)
+    if events_timezone:
+        _save_events_timezone(events_timezone)
+        return events_timezone
+
+    logger.warning(
+        'Not able to retrieve events time zone from the server. '
+        'Assuming Europe/London time zone.'
+    )
+    return datetime.timezone(
+        datetime.datetime.now(tz=ZoneInfo('Europe/London')).utcoffset()
+    )
+
+
+def get_events_table(events: list, output='table'):
+    table = render_events(events, output)
     if not table:
         logger.info('Nothing found')
-        return
-
-    return tabulate(
-        table,
-        headers=[
-            'Event', 'Category', 'Acestream Links', 'Language', 'Bitrate'
-        ],
-        tablefmt='fancy_grid',
-        stralign='center',
-        rowalign='center'
+    return table
+
+
+def category_name(category: str) -> str:
+    return category.title().replace('_', ' ')
+
+
+def get_listing_rows(category_sop: BeautifulSoup):
+    rows = []
+    competition = ''
+    for tag in category_sop.find_all(['a', 'img', 'span']):
+        classes = tag.get('class') or []
+        if tag.name == 'img' and tag.get('alt'):
+            competition = tag.get('alt')
+        elif tag.name == 'a' and 'live' in classes:
+            rows.append({
+                'competition': competition, 'game': tag.text,
+                'href': tag.get('href'), 'date_text': None
+            })
+            competition = ''
+        elif tag.name == 'span' and 'evdesc' in classes:
+            if rows and rows[-1]['date_text'] is None:
+                rows[-1]['date_text'] = tag.text.split('\n')[0].rstrip()
+    return rows
+
+
+def _may_match(pattern: re.Pattern, markup: str) -> bool:
+    # Attributes (img[alt]) are only searchable in the raw markup, texts
+    # split by inline tags (<b>Real</b> Madrid) only without the tags
+    return bool(
+        pattern.search(html.unescape(markup))
+        or pattern.search(html.unescape(TAG_PATTERN.sub('', markup)))
     )
 
 
-def get_events_extra_columns(event: dict):
-    properties = ['url', 'language', 'bitrate']
-    return [
-        tabulate(
-            [[link[property]] for link in event['links']],
-            tablefmt='plain'
-        ) for property in properties
-    ]
+def prefilter_listing(listing: str, pattern: re.Pattern) -> str:
+    """Cut a listing page down to the table rows where pattern may match."""
+
+    if not _may_match(pattern, listing):
+        return ''
+    rows = ROW_PATTERN.split(listing)
+    if len(rows) == 1:
+        return listing
+    return ''.join(row for row in rows if _may_match(pattern, row))
 
 
 def get_events_from_sop(
-    category_sop: BeautifulSoup, text: str,
-    hours: int, category: str, show_empty: bool,
-    include_android: bool, events_timezone: datetime.timezone
+    category_sop: BeautifulSoup, text: str, hours: int,
+    category: str, events_timezone: datetime.timezone
 ):
     pattern = re.compile(text, re.IGNORECASE)
-    live_parents = {
-        live.parent.parent for live in category_sop.findAll(
-            name='a',
-            attrs={'class': 'live'},
-            string=pattern
-        )
-    }
-    alt_parents = {
-        alt.parent.parent for alt in category_sop.findAll(
-            name='img',
-            attrs={'alt': pattern}
-        )
-    }
     all_targets = {}
     now = datetime.datetime.now(events_timezone)
     tzlocal = datetime.datetime.now().astimezone().tzinfo
 
-    for event_parent in live_parents.union(alt_parents):
-        span = event_parent.find(
-            name='span',
-            attrs={'class': 'evdesc'}
-        )
+    for row in get_listing_rows(category_sop):
+        if not (
+            pattern.search(row['game']) or pattern.search(row['competition'])
+        ):
+            continue
         try:
-            date_text = span.text.split('\n')[0].rstrip()
-            date = date_parse(date_text).replace(
+            date = date_parse(row['date_text']).replace(
                 tzinfo=events_timezone
             )
         except Exception:
             continue
         if (date - now) > datetime.timedelta(hours=hours):
             continue
-        if (now - date) > datetime.timedelta(hours=3):
+        if (now - date) > datetime.timedelta(hours=STARTED_EVENTS_HOURS):
             continue
-        live = event_parent.find(
-            name='a',
-            attrs={'class': 'live'}
-        )
         title = '\n'.join([
-            event_parent.find(name='img').get('alt'),
-            live.text,
+            row['competition'],
+            row['game'],
             date.astimezone(tz=tzlocal).strftime('%d %B at %H:%M'),
         ])
-        href = source_url + live.get('href')
+        href = source_url + row['href']
         if href not in all_targets:
             all_targets[href] = {
-                'title': title, 'date': date,
-                'url': href, 'category': category.title().replace('_', ' ')
+                'title': title, 'date': date, 'url': href,
+                'competition': row['competition'], 'game': row['game'],
+                'category': category_name(category)
             }
 
-    asyncio.run(
-        process_targets(all_targets.values(), show_empty, include_android)
-    )
-
-    return all_targets.values()
+    return list(all_targets.values())
 
 
-async def process_targets(targets, show_empty: bool, include_android: bool):
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for target in targets:
-            tasks.append(
-                process_target(
-                    session, target, show_empty, include_android
-                )
+async def process_targets(
+    session, targets, show_empty: bool, include_android: bool,
+    queue: asyncio.Queue = None
+):
+    tasks = []
+    for target in targets:
+        tasks.append(
+            process_target(
+                session, target, show_empty, include_android, queue
             )
-            game = target['title'].split('\n')[1].strip()
-            logger.info(f'Analysing event "{game}"')
+        )
+        logger.info(f'Analysing event "{target["game"].strip()}"')
 
-        if tasks:
-            logger.info('Waiting for results')
-        await asyncio.gather(*tasks)
+    if tasks:
+        logger.info('Waiting for results')
+    await asyncio.gather(*tasks)
 
 
-async def process_target(
-    session, target, show_empty: bool, include_android: bool
-):
-    pattern = re.compile(r'acestream://')
+def parse_links(html: str) -> list:
+    links_sop = make_soup(html, LINKS_RULES)
     acestream_links = []
-    async with session.get(target['url']) as resp:
-        links_sop = BeautifulSoup(await resp.text(), 'html.parser')
-    acestream_sops = links_sop.findAll(
-        name='a', attrs={'href': pattern}
-    )
-    for acestream_sop in acestream_sops:
-        link_parent = acestream_sop.parent.parent
-        language = link_parent.find(name='img').get(
-            'title'
-        ) or 'Unknown'
-        bitrate = link_parent.find(
-            name='td', attrs={'class': 'bitrate'}
-        ).text or 'Unknown'
-        url = acestream_sop.get('href')
-        if include_android:
-            url += ' (Play on Android)'
-        acestream_links.append(
-            {'url': url, 'language': language, 'bitrate': bitrate}
-        )
-    target['links'] = sorted(
+    # Language flags and bitrates precede the link they belong to
+    language = bitrate = None
+    for tag in links_sop.find_all(['a', 'img', 'td']):
+        if tag.name == 'img' and tag.get('title'):
+            language = tag.get('title')
+        elif tag.name == 'td' and 'bitrate' in (tag.get('class') or []):
+            bitrate = tag.text
+        elif tag.name == 'a' and ACESTREAM_PATTERN.search(
+            tag.get('href') or ''
+        ):
+            acestream_links.append({
+                'url': tag.get('href'),
+                'language': language or 'Unknown',
+                'bitrate': bitrate or 'Unknown'
+            })
+            language = bitrate = None
+    return sorted(
         acestream_links, key=lambda x: (x['language'], x['bitrate'])
-    ) or (
+    )
+
+
+def format_links(links: list, show_empty: bool, include_android: bool):
+    if include_android:
+        links = [
+            dict(link, url=f'{link["url"]} (Play on Android)')
+            for link in links
+        ]
+    return links or (
         [{
             'url': 'No acestream links available at the moment',
             'language': '-',
@@ -304,53 +545,441 @@ async def process_target(
     )
 
 
-def get_events(
-    text: str, hours: int, category: str,
-    show_empty: bool, include_android=False
+async def process_target(
+    session, target, show_empty: bool, include_android: bool,
+    queue: asyncio.Queue = None
 ):
-    global source_url
+    try:
+        page = await transport.fetch_async(session, target['url'], 'events')
+        links = parse_links(page.text)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        # One unreachable event page must not fail the whole search
+        logger.warning(
+            f'Not able to retrieve event "{target["url"]}": '
+            f'{str(e) or type(e).__name__}'
+        )
+        links = []
+    target['links'] = format_links(links, show_empty, include_android)
+    if queue is not None:
+        queue.put_nowait(target)
+
 
-    set_source_url()
-    events_timezone = get_events_timezone()
+async def get_category_targets(
+    session, semaphore: asyncio.Semaphore, text: str, hours: int,
+    category: str, events_timezone: datetime.timezone,
+    recovery: SourceRecovery = None
+):
+    global source_url
 
-    search_text = f'with text "{text}" ' if text else ''
-    categories = [category] if category else CATEGORIES.keys()
+    def fetch_listing():
+        return transport.fetch_async(
+            session,
+            f'{source_url}/enx/allupcomingsports/{CATEGORIES[category]}/',
+            'listings'
+        )
 
-    events = []
-    for category in categories:
+    async with semaphore:
+        search_text = f'with text "{text}" ' if text else ''
         logger.info(
             f'Searching for events {search_text}'
             f'on category "{category}" in '
             f'the next {hours} hours'
         )
-        resp = requests.get(
-            f'{source_url}/enx/allupcomingsports/{CATEGORIES[category]}/'
+        if recovery:
+            page = await recovery.fetch(fetch_listing)
+        else:
+            page = await fetch_listing()
+        if page.redirected:
+            new_url = 'https://' + urlparse(page.url).netloc
+            if new_url != source_url:
+                logger.warning(
+                    f'Source url has changed from "{source_url}" '
+                    f'to "{new_url}"'
+                )
+                source_url = new_url
+        listing = page.text
+
+    # Anchored patterns can match an event title but not the raw page
+    if text and not ANCHORS_PATTERN.search(text):
+        listing = prefilter_listing(
+            listing, re.compile(text, re.IGNORECASE)
         )
-        resp.raise_for_status()
-        if resp.history:
-            new_url = 'https://' + urlparse(resp.url).netloc
-            logger.warning(
-                f'Source url has changed from "{source_url}" to "{new_url}"'
+        if not listing:
+            return []
+    main_sop = make_soup(listing, LISTING_RULES)
+
+    return get_events_from_sop(
+        main_sop, text, hours, category, events_timezone
+    )
+
+
+async def get_category_events(
+    session, semaphore: asyncio.Semaphore, text: str, hours: int,
+    category: str, show_empty: bool, include_android: bool,
+    events_timezone: datetime.timezone, store: EventStore = None,
+    queue: asyncio.Queue = None, recovery: SourceRecovery = None
+):
+    targets = await get_category_targets(
+        session, semaphore, text, hours, category, events_timezone,
+        recovery
+    )
+    if store:
+        await sync_store(
+            session, store, targets, show_empty, include_android, queue
+        )
+        return targets
+    # The event pages of this category are dispatched right away, while
+    # the listing pages of the other categories are still being fetched
+    await process_targets(
+        session, targets, show_empty, include_android, queue
+    )
+    return targets
+
+
+async def sync_store(
+    session, store: EventStore, targets: list, show_empty: bool,
+    include_android: bool, queue: asyncio.Queue = None
+):
+    known_links = store.get_links(
+        [target['url'] for target in targets], STORE_LINKS_TTL
+    )
+    pending = [t for t in targets if t['url'] not in known_links]
+    await process_targets(session, pending, False, False)
+    for target in targets:
+        if target['url'] in known_links:
+            target['links'] = known_links[target['url']]
+    inserted, updated = store.sync(
+        targets, {target['url'] for target in pending}
+    )
+    if inserted or updated:
+        logger.info(
+            f'Event store: {inserted} new and {updated} updated events'
+        )
+    if queue is not None:
+        for target in targets:
+            queue.put_nowait(dict(
+                target, links=format_links(
+                    target['links'] or [], show_empty, include_android
+                )
+            ))
+
+
+async def iter_events(
+    text: str, hours: int, category: str = None, show_empty=False,
+    include_android=False, concurrency=CATEGORY_CONCURRENCY,
+    store: EventStore = None
+):
+    """Yield the events as soon as their pages have been processed."""
+
+    categories = [category] if category else list(CATEGORIES.keys())
+
+    if store:
+        expired = store.expire()
+        if expired:
+            logger.info(f'Event store: {expired} finished events expired')
+
+    stats_start = transport.stats.snapshot()
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
+    pinned_resolver = transport.PinnedResolver()
+    try:
+        async with transport.client_session(
+            resolver=pinned_resolver
+        ) as session:
+            recovery = SourceRecovery(session, pinned_resolver)
+            events_timezone = await bootstrap(
+                session, pinned_resolver, recovery
             )
-            source_url = new_url
-        main_sop = BeautifulSoup(resp.text, 'html.parser')
 
-        events.extend(
-            get_events_from_sop(
-                main_sop, text, hours, category,
-                show_empty, include_android, events_timezone
+            async def produce():
+                try:
+                    await asyncio.gather(*[
+                        get_category_events(
+                            session, semaphore, text, hours, category,
+                            show_empty, include_android, events_timezone,
+                            store, queue, recovery
+                        ) for category in categories
+                    ])
+                finally:
+                    queue.put_nowait(None)
+
+            producer = asyncio.ensure_future(produce())
+            try:
+                while True:
+                    event = await queue.get()
+                    if event is None:
+                        break
+                    yield event
+                await producer
+            finally:
+                if not producer.done():
+                    producer.cancel()
+                    await asyncio.gather(producer, return_exceptions=True)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        record_mirror_health(source_url, False)
+        raise
+    record_mirror_health(source_url, True)
+    logger.info(transport.stats.summary(stats_start))
+
+
+def get_events(
+    text: str, hours: int, category: str,
+    show_empty: bool, include_android=False,
+    concurrency=CATEGORY_CONCURRENCY, store: EventStore = None
+):
+    async def collect():
+        return [
+            event async for event in iter_events(
+                text, hours, category, show_empty,
+                include_android, concurrency, store
             )
+        ]
+
+    events = asyncio.run(collect())
+
+    if store:
+        events = store.query(
+            text, hours, category_name(category) if category else None
         )
+        for event in events:
+            event['links'] = format_links(
+                event['links'], show_empty, include_android
+            )
+    return events
+
+
+async def _checked_target(session, target: dict) -> dict:
+    await process_target(session, target, False, False)
+    return target
 
+
+async def search_index(
+    index: EventIndex, text: str, hours: int, category: str = None,
+    show_empty=False, include_android=False,
+    concurrency=CATEGORY_CONCURRENCY, callback=None
+) -> list:
+    """Search the index, only going to the network for what it lacks."""
+
+    def found(event):
+        event['links'] = format_links(
+            event['links'] or [], show_empty, include_android
+        )
+        if callback and event['links']:
+            callback(event)
+
+    categories = [category] if category else list(CATEGORIES.keys())
+    stale = [c for c in categories if not index.covers(c, hours)]
+    events = None if stale else index.search(text, hours, category)
+    if events is not None and not index.stale_links(events):
+        logger.info(f'Found {len(events)} events in the local index')
+        for event in events:
+            found(event)
+        return events
+
+    stats_start = transport.stats.snapshot()
+    semaphore = asyncio.Semaphore(concurrency)
+    pinned_resolver = transport.PinnedResolver()
+    try:
+        async with transport.client_session(
+            resolver=pinned_resolver
+        ) as session:
+            recovery = SourceRecovery(session, pinned_resolver)
+            events_timezone = await bootstrap(
+                session, pinned_resolver, recovery
+            )
+            results = await asyncio.gather(*[
+                get_category_targets(
+                    session, semaphore, '', hours, stale_category,
+                    events_timezone, recovery
+                ) for stale_category in stale
+            ])
+            for stale_category, targets in zip(stale, results):
+                index.add(stale_category, hours, targets)
+            events = index.search(text, hours, category)
+            pending = index.stale_links(events)
+            pending_urls = {event['url'] for event in pending}
+            for event in events:
+                if event['url'] not in pending_urls:
+                    found(event)
+            if pending:
+                logger.info(f'Analysing {len(pending)} events')
+            tasks = [
+                asyncio.ensure_future(_checked_target(session, event))
+                for event in pending
+            ]
+            try:
+                for checked in asyncio.as_completed(tasks):
+                    event = await checked
+                    index.set_links([event])
+                    found(event)
+            finally:
+                for task in tasks:
+                    task.cancel()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        record_mirror_health(source_url, False)
+        raise
+    record_mirror_health(source_url, True)
+    logger.info(transport.stats.summary(stats_start))
     return events
 
 
-def run(category: str, text: str, hours: int, show_empty: bool):
-    events = get_events(text, hours, category, show_empty)
+def get_indexed_events(
+    index: EventIndex, text: str, hours: int, category: str,
+    show_empty: bool, include_android=False,
+    concurrency=CATEGORY_CONCURRENCY, callback=None
+):
+    """Same as get_events, answered from index whenever possible."""
+
+    return asyncio.run(
+        search_index(
+            index, text, hours, category, show_empty, include_android,
+            concurrency, callback
+        )
+    )
+
+
+def poll_interval(date: datetime.datetime) -> float:
+    """Seconds to wait before checking a link-less event page again."""
+
+    to_kickoff = (
+        date - datetime.datetime.now(datetime.timezone.utc)
+    ).total_seconds()
+    return min(
+        max(to_kickoff / WATCH_BACKOFF_FACTOR, WATCH_MIN_INTERVAL),
+        WATCH_MAX_INTERVAL
+    )
+
+
+async def watch_events(
+    text: str, hours: int, category: str = None, include_android=False,
+    concurrency=CATEGORY_CONCURRENCY
+):
+    """Yield every event as soon as its page has acestream links."""
+
+    categories = [category] if category else list(CATEGORIES.keys())
+    semaphore = asyncio.Semaphore(concurrency)
+    pinned_resolver = transport.PinnedResolver()
+    seen = {}
+    pending = {}
+    next_sweep = 0
+    async with transport.client_session(resolver=pinned_resolver) as session:
+        events_timezone = await bootstrap(
+            session, pinned_resolver,
+            SourceRecovery(session, pinned_resolver)
+        )
+        while True:
+            stats_start = transport.stats.snapshot()
+            now = time.time()
+            limit = now - STARTED_EVENTS_HOURS * 3600
+            try:
+                if now >= next_sweep:
+                    next_sweep = now + WATCH_SWEEP_INTERVAL
+                    # Every sweep may probe for a new source url once
+                    recovery = SourceRecovery(session, pinned_resolver)
+                    results = await asyncio.gather(*[
+                        get_category_targets(
+                            session, semaphore, text, hours, category,
+                            events_timezone, recovery
+                        ) for category in categories
+                    ])
+                    for target in itertools.chain(*results):
+                        if target['url'] not in seen:
+                            seen[target['url']] = target['date'].timestamp()
+                            pending[target['url']] = (target, now)
+                due = [t for t, poll in pending.values() if poll <= now]
+                await process_targets(session, due, False, include_android)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f'Not able to refresh the events: {e}')
+                record_mirror_health(source_url, False)
+                next_sweep = now + WATCH_MIN_INTERVAL
+                due = []
+                for url, (target, poll) in pending.items():
+                    if poll <= now:
+                        pending[url] = (target, now + WATCH_MIN_INTERVAL)
+            for target in due:
+                if target['links']:
+                    del pending[target['url']]
+                    yield target
+                elif target['date'].timestamp() < limit:
+                    del pending[target['url']]
+                else:
+                    pending[target['url']] = (
+                        target, time.time() + poll_interval(target['date'])
+                    )
+            seen = {url: date for url, date in seen.items() if date >= limit}
+            if due:
+                logger.info(
+                    f'Watching {len(pending)} events without links, '
+                    f'{transport.stats.summary(stats_start)}'
+                )
+            wakeup = min([next_sweep, *(p for _, p in pending.values())])
+            await asyncio.sleep(max(wakeup - time.time(), 0))
+
+
+async def print_ndjson(
+    text: str, hours: int, category: str, show_empty: bool,
+    concurrency: int, store: EventStore = None
+):
+    async for event in iter_events(
+        text, hours, category, show_empty,
+        concurrency=concurrency, store=store
+    ):
+        if event['links']:
+            print(event_to_json(event), flush=True)
+
+
+async def print_watched_events(
+    text: str, hours: int, category: str, concurrency: int, output: str
+):
+    writer = EventWriter(output)
+    if output in BOX_STYLES:
+        print('')
+    try:
+        async for event in watch_events(
+            text, hours, category, concurrency=concurrency
+        ):
+            rendered = writer.write(event)
+            if rendered:
+                print(rendered, flush=True)
+    finally:
+        footer = writer.close()
+        if footer:
+            print(footer, flush=True)
+
+
+def run(
+    category: str, text: str, hours: int, show_empty: bool,
+    concurrency=CATEGORY_CONCURRENCY, store: EventStore = None,
+    output='table', watch=False
+):
+    if watch:
+        try:
+            asyncio.run(
+                print_watched_events(
+                    text, hours, category, concurrency, output
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if output == 'ndjson':
+        asyncio.run(
+            print_ndjson(
+                text, hours, category, show_empty, concurrency, store
+            )
+        )
+        return
+
+    events = get_events(
+        text, hours, category, show_empty,
+        concurrency=concurrency, store=store
+    )
 
-    events_table = get_events_table(events)
+    events_table = get_events_table(events, output)
     if not events_table:
         return
 
-    print('')
+    if output in BOX_STYLES:
+        print('')
     print(events_table)
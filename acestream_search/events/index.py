@@ -0,0 +1,144 @@
+import bisect
+import datetime
+import re
+import threading
+import time
+
+from acestream_search.common.constants import INDEX_LINKS_TTL
+from acestream_search.common.constants import INDEX_TTL
+from acestream_search.common.constants import STARTED_EVENTS_HOURS
+
+TOKEN_PATTERN = re.compile(r'\w+')
+REGEX_PATTERN = re.compile(r'[\\^$.|?*+()\[\]{}]')
+PRIVATE_FIELDS = ('category_key', 'links_checked_at')
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class EventIndex():
+    """Session-level index of the events found in the category listings."""
+
+    def __init__(self, ttl=INDEX_TTL, links_ttl=INDEX_LINKS_TTL):
+        self.ttl = ttl
+        self.links_ttl = links_ttl
+        self.lock = threading.Lock()
+        self.events = {}
+        self.coverage = {}
+        self.postings = {}
+        self.tokens = []
+
+    def covers(self, category: str, hours: int) -> bool:
+        if category not in self.coverage:
+            return False
+        # The window slides by up to ttl seconds, as cached listings do
+        indexed_at, indexed_hours = self.coverage[category]
+        return time.time() - indexed_at < self.ttl and hours <= indexed_hours
+
+    def add(self, category: str, hours: int, targets: list):
+        """Replace the indexed events of category with the listing targets."""
+
+        with self.lock:
+            previous = {
+                url: event for url, event in self.events.items()
+                if event['category_key'] == category
+            }
+            for url in previous:
+                self._remove(url)
+            for target in targets:
+                event = dict(target, category_key=category)
+                known = previous.get(target['url'])
+                if known and known['links_checked_at']:
+                    event['links'] = known['links']
+                    event['links_checked_at'] = known['links_checked_at']
+                else:
+                    event['links'] = None
+                    event['links_checked_at'] = 0
+                self._insert(event)
+            self.tokens = sorted(self.postings)
+            self.coverage[category] = (time.time(), hours)
+
+    def _insert(self, event: dict):
+        self.events[event['url']] = event
+        text = ' '.join(
+            [event['competition'], event['game'], event['category']]
+        )
+        for token in tokenize(text):
+            self.postings.setdefault(token, set()).add(event['url'])
+
+    def _remove(self, url: str):
+        event = self.events.pop(url)
+        text = ' '.join(
+            [event['competition'], event['game'], event['category']]
+        )
+        for token in tokenize(text):
+            urls = self.postings.get(token)
+            if urls is None:
+                continue
+            urls.discard(url)
+            if not urls:
+                del self.postings[token]
+
+    def _prefix_matches(self, prefix: str) -> set:
+        urls = set()
+        start = bisect.bisect_left(self.tokens, prefix)
+        for token in self.tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            urls |= self.postings.get(token, set())
+        return urls
+
+    def _candidates(self, text: str) -> list:
+        words = tokenize(text)
+        if not words:
+            return list(self.events.values())
+        if REGEX_PATTERN.search(text):
+            pattern = re.compile(text, re.IGNORECASE)
+            return [
+                event for event in self.events.values()
+                if pattern.search(event['game'])
+                or pattern.search(event['competition'])
+            ]
+        # Plain text: every word must be the prefix of an indexed token
+        urls = None
+        for word in words:
+            matches = self._prefix_matches(word)
+            urls = matches if urls is None else urls & matches
+        return [self.events[url] for url in urls]
+
+    def search(self, text: str, hours: int, category: str = None) -> list:
+        """Return copies of the indexed events matching text."""
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        start = now - datetime.timedelta(hours=STARTED_EVENTS_HOURS)
+        end = now + datetime.timedelta(hours=hours)
+        with self.lock:
+            events = [
+                {
+                    key: value for key, value in event.items()
+                    if key not in PRIVATE_FIELDS
+                } for event in self._candidates(text)
+                if (not category or event['category_key'] == category)
+                and start <= event['date'] <= end
+            ]
+        return sorted(
+            events, key=lambda x: (x['date'], x['category'], x['title'])
+        )
+
+    def stale_links(self, events: list) -> list:
+        limit = time.time() - self.links_ttl
+        with self.lock:
+            return [
+                event for event in events if event['url'] in self.events
+                and self.events[event['url']]['links_checked_at'] < limit
+            ]
+
+    def set_links(self, events: list):
+        now = time.time()
+        with self.lock:
+            for event in events:
+                if event['url'] in self.events:
+                    self.events[event['url']].update(
+                        links=event['links'], links_checked_at=now
+                    )
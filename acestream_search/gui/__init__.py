@@ -1,8 +1,9 @@
+import asyncio
+import ipaddress
 import logging
-import os
 import pkgutil
+import queue
 import re
-import shutil
 import threading
 import tkinter as tk
 import webbrowser
@@ -11,16 +12,25 @@ from tkinter import ttk
 from tkinter.scrolledtext import ScrolledText
 
 from acestream_search.adb import Client
-from acestream_search.adb.discover import discover_adb_devices
+from acestream_search.adb.discover import scan_adb_devices
 from acestream_search.adb.server import run_adb_command
-from acestream_search.channels import get_channels
-from acestream_search.channels import get_channels_table
 from acestream_search.common.constants import CATEGORIES
-from acestream_search.events import get_events
-from acestream_search.events import get_events_table
+from acestream_search.common.constants import GUI_UPDATE_BATCH
+from acestream_search.common.constants import GUI_UPDATE_INTERVAL
 from acestream_search.gui.hyperlink import HyperlinkManager
 from acestream_search.log import FORMAT
 from acestream_search.log import logger
+from acestream_search.render import CHANNELS_HEADERS
+from acestream_search.render import channels_table_rows
+from acestream_search.render import CHANNELS_WIDTHS
+from acestream_search.render import EVENTS_HEADERS
+from acestream_search.render import events_table_rows
+from acestream_search.render import EVENTS_WIDTHS
+from acestream_search.render import TableWriter
+
+ANDROID_LINK_PATTERN = re.compile(
+    '(acestream:\\/\\/\\S+ \\(Play on Android\\))'
+)
 
 
 class TextHandler(logging.Handler):
@@ -45,93 +55,118 @@ class TextHandler(logging.Handler):
 
 
 class GuiApp():
-    root = tk.Tk(className='acestream-search-gui')
-    root.title('Acestream Search GUI')
-    root.grid_columnconfigure(0, weight=1)
-    root.grid_rowconfigure(0, weight=1)
-
-    icon_bin = pkgutil.get_data('acestream_search.gui', 'resources/tv.png')
-    root.iconphoto(False, tk.PhotoImage(data=icon_bin))
-
-    main_frame = ttk.Frame(root, padding='20')
-    main_frame.grid(row=0, column=0, sticky=(tk.NSEW))
-    main_frame.columnconfigure(3, weight=1)
-    main_frame.rowconfigure(10, weight=1)
-
-    log_label = ttk.Label(main_frame, text='Console:')
-    log_label.grid(row=0, column=0, sticky=tk.W)  # Place log label in row 0
-
-    log_text = ScrolledText(
-        main_frame, width=155, height=5, wrap=tk.WORD, font=('Courier', 9)
-    )
-    log_text.grid(row=1, column=0, pady=5, columnspan=4, sticky=(tk.EW))
-    log_text.config(state=tk.DISABLED)
-
-    # Set up logging
-    text_handler = TextHandler(log_text)
-    logger.addHandler(text_handler)
-
-    category_label = ttk.Label(main_frame, text='Category:')
-    category_label.grid(row=2, column=0, sticky=tk.W)
-
-    categories = ['All'] + sorted(CATEGORIES.keys())
-
-    category_var = tk.StringVar()
-    category_combobox = ttk.Combobox(
-        main_frame, textvariable=category_var,
-        values=categories, state='readonly'
-    )
-    category_combobox.grid(row=2, column=1, sticky=tk.W)
-    category_combobox.current(0)
-
-    search_label = ttk.Label(main_frame, text='Search Text:')
-    search_label.grid(row=3, column=0, sticky=tk.W)
-
-    search_entry = ttk.Entry(main_frame)
-    search_entry.grid(row=3, column=1, sticky=tk.W)
-
-    hours_label = ttk.Label(main_frame, text='Hours:')
-    hours_label.grid(row=4, column=0, sticky=tk.W)
-
-    hours_entry = ttk.Entry(main_frame)
-    hours_entry.grid(row=4, column=1, sticky=tk.W)
-    hours_entry.insert(tk.END, '1')
-
-    ip_label = ttk.Label(main_frame, text='Android device IP: ')
-    ip_label.grid(row=5, column=0, sticky=tk.W)
-    ip_var = tk.StringVar()
-    ip_combobox = ttk.Combobox(main_frame, textvariable=ip_var)
-    ip_combobox.grid(row=5, column=1, sticky=tk.W)
-    ip_warning = ttk.Label(
-        main_frame,
-        text='(Android devices must have remote ADB '
-        'debugging enabled and Ace Stream app installed)'
-    )
-    ip_warning.grid(row=5, column=3, sticky=tk.W)
-
-    show_empty_var = tk.BooleanVar()
-    show_empty_checkbox = ttk.Checkbutton(
-        main_frame, text='Show Empty', variable=show_empty_var
-    )
-    show_empty_checkbox.grid(row=6, column=0, sticky=tk.W)
-
-    result_label = ttk.Label(main_frame, text='Results:')
-    result_label.grid(row=9, column=0, sticky=tk.W)
-
-    # Create a ScrolledText with horizontal scrolling
-    result_text = ScrolledText(
-        main_frame, width=155, height=20, wrap=tk.WORD, font=('Courier', 9)
-    )
-    result_text.grid(row=10, column=0, columnspan=4, pady=5, sticky=tk.NSEW)
-    result_text.config(state=tk.DISABLED, foreground='blue3')
-
-    adb_client = Client()
-
-    def __init__(self):
+    def __init__(self, use_adb_server=False):
+        self.root = tk.Tk(className='acestream-search-gui')
+        self.root.title('Acestream Search GUI')
+        self.root.grid_columnconfigure(0, weight=1)
+        self.root.grid_rowconfigure(0, weight=1)
+
+        icon_bin = pkgutil.get_data(
+            'acestream_search.gui', 'resources/tv.png'
+        )
+        self.root.iconphoto(False, tk.PhotoImage(data=icon_bin))
+
+        self.main_frame = ttk.Frame(self.root, padding='20')
+        self.main_frame.grid(row=0, column=0, sticky=(tk.NSEW))
+        self.main_frame.columnconfigure(3, weight=1)
+        self.main_frame.rowconfigure(10, weight=1)
+
+        log_label = ttk.Label(self.main_frame, text='Console:')
+        # Place log label in row 0
+        log_label.grid(row=0, column=0, sticky=tk.W)
+
+        self.log_text = ScrolledText(
+            self.main_frame, width=155, height=5, wrap=tk.WORD,
+            font=('Courier', 9)
+        )
+        self.log_text.grid(
+            row=1, column=0, pady=5, columnspan=4, sticky=(tk.EW)
+        )
+        self.log_text.config(state=tk.DISABLED)
+
+        # Set up logging
+        text_handler = TextHandler(self.log_text)
+        logger.addHandler(text_handler)
+
+        category_label = ttk.Label(self.main_frame, text='Category:')
+        category_label.grid(row=2, column=0, sticky=tk.W)
+
+        self.categories = ['All'] + sorted(CATEGORIES.keys())
+
+        self.category_var = tk.StringVar()
+        self.category_combobox = ttk.Combobox(
+            self.main_frame, textvariable=self.category_var,
+            values=self.categories, state='readonly'
+        )
+        self.category_combobox.grid(row=2, column=1, sticky=tk.W)
+        self.category_combobox.current(0)
+
+        search_label = ttk.Label(self.main_frame, text='Search Text:')
+        search_label.grid(row=3, column=0, sticky=tk.W)
+
+        self.search_entry = ttk.Entry(self.main_frame)
+        self.search_entry.grid(row=3, column=1, sticky=tk.W)
+
+        hours_label = ttk.Label(self.main_frame, text='Hours:')
+        hours_label.grid(row=4, column=0, sticky=tk.W)
+
+        self.hours_entry = ttk.Entry(self.main_frame)
+        self.hours_entry.grid(row=4, column=1, sticky=tk.W)
+        self.hours_entry.insert(tk.END, '1')
+
+        ip_label = ttk.Label(self.main_frame, text='Android device IPs: ')
+        ip_label.grid(row=5, column=0, sticky=tk.W)
+        self.ip_var = tk.StringVar()
+        self.ip_combobox = ttk.Combobox(
+            self.main_frame, textvariable=self.ip_var
+        )
+        self.ip_combobox.grid(row=5, column=1, sticky=tk.W)
+        ip_warning = ttk.Label(
+            self.main_frame,
+            text='(Comma separated. Android devices must have remote ADB '
+            'debugging enabled and Ace Stream app installed)'
+        )
+        ip_warning.grid(row=5, column=3, sticky=tk.W)
+
+        self.show_empty_var = tk.BooleanVar()
+        self.show_empty_checkbox = ttk.Checkbutton(
+            self.main_frame, text='Show Empty', variable=self.show_empty_var
+        )
+        self.show_empty_checkbox.grid(row=6, column=0, sticky=tk.W)
+
+        result_label = ttk.Label(self.main_frame, text='Results:')
+        result_label.grid(row=9, column=0, sticky=tk.W)
+
+        # Create a ScrolledText with horizontal scrolling
+        self.result_text = ScrolledText(
+            self.main_frame, width=155, height=20, wrap=tk.WORD,
+            font=('Courier', 9)
+        )
+        self.result_text.grid(
+            row=10, column=0, columnspan=4, pady=5, sticky=tk.NSEW
+        )
+        self.result_text.config(state=tk.DISABLED, foreground='blue3')
+
+        self.adb_client = Client(use_adb_server)
+        # Created on the first search, the events module is slow to import
+        self.event_index = None
+        self.updates = queue.Queue()
+        self.hyperlinks = HyperlinkManager(self.result_text)
+        self.open_tags = self.hyperlinks.register('open', self.open_link)
+        self.android_tags = self.hyperlinks.register(
+            'android', self.play_link
+        )
+        # Searches run on their own event loop, so they can be cancelled
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.search_future = None
+        self.search_task = None
+        self.found_devices = queue.Queue()
+        self.discovery_future = None
         self.search_events_button = ttk.Button(
             self.main_frame,
             text='Search Events Streams',
-            command=self.start_search_events_thread
+            command=self.search_events_streams
         )
         self.search_events_button.grid(
             row=7, column=0, columnspan=4, pady=5, sticky=(tk.EW)
@@ -139,15 +174,22 @@ class GuiApp():
         self.search_channels_button = ttk.Button(
             self.main_frame,
             text='Search Channels Streams',
-            command=self.start_search_channels_thread
+            command=self.search_channels_streams
         )
         self.search_channels_button.grid(
             row=8, column=0, columnspan=4, pady=5, sticky=(tk.EW)
         )
+        self.stop_button = ttk.Button(
+            self.main_frame,
+            text='Stop',
+            command=self.stop_search,
+            state=tk.DISABLED
+        )
+        self.stop_button.grid(row=9, column=3, sticky=tk.E)
         self.refresh_adb_button = ttk.Button(
             self.main_frame,
             text='Refresh Devices',
-            command=self.start_refresh_adb_thread
+            command=self.discover_devices
         )
         self.refresh_adb_button.grid(
             row=5, column=2, padx=5, sticky=(tk.W)
@@ -165,59 +207,99 @@ class GuiApp():
         self.category_combobox.focus()
 
     def discover_devices(self):
+        """Scan for devices on the search loop, listing them as found."""
+
+        async def discover():
+            try:
+                await scan_adb_devices(self.found_devices.put)
+            except Exception as e:
+                logger.error(f'Device discovery failed: {e}')
+
         self.refresh_adb_button.config(state=tk.DISABLED)
-        self.ip_combobox.config(state=tk.DISABLED)
-        ips = discover_adb_devices()
-        self.ip_combobox.config(values=ips)
+        self.ip_combobox.config(values=[])
+        self.discovery_future = asyncio.run_coroutine_threadsafe(
+            discover(), self.loop
+        )
+
+    def add_devices(self):
+        ips = []
+        try:
+            while True:
+                ips.append(self.found_devices.get_nowait())
+        except queue.Empty:
+            pass
         if ips:
-            self.ip_combobox.current(0)
-        self.refresh_adb_button.config(state=tk.NORMAL)
-        self.ip_combobox.config(state=tk.NORMAL)
+            values = set(self.ip_combobox.cget('values')) | set(ips)
+            self.ip_combobox.config(
+                values=sorted(values, key=ipaddress.ip_address)
+            )
+            if not self.ip_var.get():
+                self.ip_var.set(ips[0])
+        if self.discovery_future and self.discovery_future.done():
+            self.discovery_future = None
+            self.refresh_adb_button.config(state=tk.NORMAL)
 
     def play_on_android(self, link):
-        threading.Thread(
-            target=self.adb_client.play_stream,
-            daemon=True,
-            args=(self.ip_var.get(), link)
-        ).start()
-
-    def show_results(self, table):
-        """Function to show the results in the results window."""
-
-        chunks = re.split(
-            '(acestream:\\/\\/\\S+ \\(Play on Android\\))',
-            table
+        ips = [ip.strip() for ip in self.ip_var.get().split(',')]
+        self.adb_client.play([ip for ip in ips if ip], link)
+
+    def open_link(self, index):
+        webbrowser.open(self.hyperlinks.tag_text(self.open_tags[1], index))
+
+    def play_link(self, index):
+        link = self.hyperlinks.tag_text(
+            self.open_tags[1], f'{index} linestart', f'{index} lineend'
         )
-        self.result_text.config(state=tk.NORMAL)
-        self.result_text.insert(tk.END, '\n')
-        hyperlinks = HyperlinkManager(self.result_text)
-        for chunk in chunks:
-            if chunk.startswith('acestream://'):
-                link = chunk.split()[0]
-                self.result_text.insert(
-                    tk.END,
-                    link,
-                    hyperlinks.add(partial(webbrowser.open, link))
-                )
-                self.result_text.insert(tk.END, ' ')
-                self.result_text.insert(
-                    tk.END,
-                    '(Play on Android)',
-                    hyperlinks.add(partial(self.play_on_android, link))
-                )
-            else:
-                self.result_text.insert(tk.END, chunk)
-        self.result_text.insert(tk.END, '\n')
-        self.result_text.config(state=tk.DISABLED)
+        if link:
+            self.play_on_android(link)
+
+    def clear_results(self):
+        self.updates.put(None)
+
+    def add_results(self, text):
+        """Queue text for the results window, from any thread."""
+
+        self.updates.put(text)
+
+    def process_updates(self):
+        """Insert the queued results in batches, on the Tk main loop."""
+
+        clear = False
+        chunks = []
+        try:
+            for _ in range(GUI_UPDATE_BATCH):
+                text = self.updates.get_nowait()
+                if text is None:
+                    clear = True
+                    chunks = []
+                    continue
+                for chunk in ANDROID_LINK_PATTERN.split(text + '\n'):
+                    if chunk.startswith('acestream://'):
+                        chunks.extend([
+                            chunk.split()[0], self.open_tags, ' ', (),
+                            '(Play on Android)', self.android_tags
+                        ])
+                    elif chunk:
+                        chunks.extend([chunk, ()])
+        except queue.Empty:
+            pass
+        if self.search_future and self.search_future.done():
+            self.search_future = None
+            self.stop_button.config(state=tk.DISABLED)
+        self.add_devices()
+        if clear or chunks:
+            self.result_text.config(state=tk.NORMAL)
+            if clear:
+                self.result_text.delete('1.0', tk.END)
+                self.result_text.insert(tk.END, '\n')
+            if chunks:
+                self.result_text.insert(tk.END, *chunks)
+            self.result_text.config(state=tk.DISABLED)
+        self.root.after(GUI_UPDATE_INTERVAL, self.process_updates)
 
     def search_events_streams(self):
         """Function to initiate the events search process."""
 
-        # Clear the result_text widget
-        self.result_text.config(state=tk.NORMAL)
-        self.result_text.delete('1.0', tk.END)
-        self.result_text.config(state=tk.DISABLED)
-
         try:
             hours = int(self.hours_entry.get())
         except ValueError:
@@ -237,51 +319,84 @@ class GuiApp():
         search_text = self.search_entry.get()
         show_empty = self.show_empty_var.get()
 
-        # Disable the buttons while search is in progress
-        self.search_events_button.config(state=tk.DISABLED)
-        self.search_channels_button.config(state=tk.DISABLED)
-
-        events = get_events(search_text, hours, category, show_empty, True)
-        table = get_events_table(events)
-
-        if table:
-            self.show_results(table)
+        async def search():
+            from acestream_search.events import search_index
+            from acestream_search.events.index import EventIndex
+
+            if self.event_index is None:
+                self.event_index = EventIndex()
+            # Rows are shown as soon as the links of each event are known
+            writer = TableWriter(EVENTS_HEADERS, EVENTS_WIDTHS)
+            try:
+                await search_index(
+                    self.event_index, search_text, hours, category,
+                    show_empty, True, callback=lambda event: self.add_results(
+                        writer.row(events_table_rows([event])[0])
+                    )
+                )
+            finally:
+                self.close_results(writer)
+            if not writer.rows:
+                logger.info('Nothing found')
 
-        # Enable the buttons after the search is finished
-        self.search_events_button.config(state=tk.NORMAL)
-        self.search_channels_button.config(state=tk.NORMAL)
+        self.start_search(search)
 
     def search_channels_streams(self):
         """Function to initiate the channels search process."""
 
-        # Clear the result_text widget
-        self.result_text.config(state=tk.NORMAL)
-        self.result_text.delete('1.0', tk.END)
-        self.result_text.config(state=tk.DISABLED)
+        search_text = self.search_entry.get()
 
-        # Disable the buttons while search is in progress
-        self.search_events_button.config(state=tk.DISABLED)
-        self.search_channels_button.config(state=tk.DISABLED)
+        async def search():
+            from acestream_search.channels import get_channels
 
-        events = get_channels(include_android=True)
-        table = get_channels_table(events)
+            channels = await asyncio.get_running_loop().run_in_executor(
+                None, partial(
+                    get_channels, include_android=True, search=search_text
+                )
+            )
+            writer = TableWriter(CHANNELS_HEADERS, CHANNELS_WIDTHS)
+            for row in channels_table_rows(channels):
+                self.add_results(writer.row(row))
+            self.close_results(writer)
+            if not writer.rows:
+                logger.info('Nothing found')
+
+        self.start_search(search)
+
+    def start_search(self, search):
+        """Run the search coroutine function on the search loop."""
+
+        async def run_search():
+            previous = self.search_task
+            self.search_task = asyncio.current_task()
+            if previous:
+                previous.cancel()
+                await asyncio.gather(previous, return_exceptions=True)
+            self.clear_results()
+            try:
+                await search()
+            except asyncio.CancelledError:
+                logger.info('Search cancelled')
+                raise
+            except Exception as e:
+                logger.error(f'Search failed: {e}')
+
+        self.search_future = asyncio.run_coroutine_threadsafe(
+            run_search(), self.loop
+        )
+        self.stop_button.config(state=tk.NORMAL)
 
-        if table:
-            self.show_results(table)
+    def stop_search(self):
+        if self.search_future:
+            self.search_future.cancel()
 
-        # Enable the buttons after the search is finished
-        self.search_events_button.config(state=tk.NORMAL)
-        self.search_channels_button.config(state=tk.NORMAL)
+    def close_results(self, writer: TableWriter):
+        footer = writer.close()
+        if footer:
+            self.add_results(footer)
 
     def on_enter(self, event):
-        if str(self.search_events_button['state']) == tk.DISABLED or \
-           str(self.search_channels_button['state']) == tk.DISABLED:
-            logger.warning(
-                'Another search is already in progress. Try again later.'
-            )
-            return
-
-        self.start_search_events_thread()
+        self.search_events_streams()
 
     def combobox_jump_to_item(self, event):
         char = event.char.lower()
@@ -308,36 +423,21 @@ class GuiApp():
         else:
             combo.current(matching_indices[0])
 
-    def start_search_events_thread(self):
-        threading.Thread(
-            target=self.search_events_streams, daemon=True
-        ).start()
-
-    def start_search_channels_thread(self):
-        threading.Thread(
-            target=self.search_channels_streams, daemon=True
-        ).start()
-
-    def start_refresh_adb_thread(self):
-        threading.Thread(target=self.discover_devices, daemon=True).start()
-
     def cleanup(self):
+        self.adb_client.pool.close()
         if self.adb_client.server_running:
             logger.info('Stopping ADB server')
             self.adb_client.server_running = not run_adb_command(
                 self.adb_client.adb_path, 'kill-server'
             )
-        if not self.adb_client.server_running and self.adb_client.adb_path:
-            temp_dir = os.path.join(self.adb_client.adb_path, 'platform-tools')
-            shutil.rmtree(temp_dir)
-            logger.info(
-                f'Deleted temp directory with adb binary "{temp_dir}"'
-            )
 
     def window_exit(self):
+        self.stop_search()
+        self.loop.call_soon_threadsafe(self.loop.stop)
         self.cleanup()
         self.root.destroy()
 
     def run(self):
-        self.start_refresh_adb_thread()
+        self.discover_devices()
+        self.process_updates()
         self.root.mainloop()
@@ -4,6 +4,7 @@ from tkinter import CURRENT
 
 
 class HyperlinkManager:
+    """Clickable links in a Text widget."""
 
     def __init__(self, text):
 
@@ -15,16 +16,22 @@ class HyperlinkManager:
         self.text.tag_bind('hyper', '<Leave>', self._leave)
         self.text.tag_bind('hyper', '<Button-1>', self._click)
 
-        self.reset()
+        self.actions = {}
 
-    def reset(self):
-        self.links = {}
-
-    def add(self, action):
-        tag = 'hyper-%d' % len(self.links)
-        self.links[tag] = action
+    def register(self, name, action):
+        tag = 'hyper-%s' % name
+        self.actions[tag] = action
         return 'hyper', tag
 
+    def tag_text(self, tag, index, stop=None):
+        """Return the text of the range of tag holding index."""
+
+        if stop is None:
+            tag_range = self.text.tag_prevrange(tag, '%s+1c' % index)
+        else:
+            tag_range = self.text.tag_nextrange(tag, index, stop)
+        return self.text.get(*tag_range) if tag_range else None
+
     def _enter(self, event):
         self.text.config(cursor='hand2')
 
@@ -33,6 +40,6 @@ class HyperlinkManager:
 
     def _click(self, event):
         for tag in self.text.tag_names(CURRENT):
-            if tag[:6] == 'hyper-':
-                self.links[tag]()
+            if tag in self.actions:
+                self.actions[tag](self.text.index(CURRENT))
                 return
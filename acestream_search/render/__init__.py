@@ -0,0 +1,267 @@
+import csv
+import io
+import json
+import textwrap
+
+from acestream_search.common.constants import ACESTREAM_PREFIX
+
+BOX_STYLES = {
+    'table': {
+        'top': ('╒', '═', '╤', '╕'),
+        'header': ('╞', '═', '╪', '╡'),
+        'row': ('├', '─', '┼', '┤'),
+        'bottom': ('╘', '═', '╧', '╛'),
+        'vertical': '│'
+    },
+    'grid': {
+        'top': ('+', '-', '+', '+'),
+        'header': ('+', '=', '+', '+'),
+        'row': ('+', '-', '+', '+'),
+        'bottom': ('+', '-', '+', '+'),
+        'vertical': '|'
+    }
+}
+EVENTS_HEADERS = [
+    'Event', 'Category', 'Acestream Links', 'Language', 'Bitrate'
+]
+EVENTS_CSV_HEADERS = [
+    'date', 'category', 'competition', 'game', 'url', 'language', 'bitrate'
+]
+CHANNELS_HEADERS = ['Channel', 'Acestream Link']
+# Fixed widths for tables rendered one row at a time, wide enough for
+# acestream links followed by " (Play on Android)". Event rows are 153
+# characters, so they fit the 155 characters of the GUI results box
+EVENTS_WIDTHS = [32, 12, 70, 12, 11]
+CHANNELS_WIDTHS = [44, 70]
+
+
+def _rule(style: dict, kind: str, widths: list) -> str:
+    left, fill, cross, right = style[kind]
+    return left + cross.join(fill * (width + 2) for width in widths) + right
+
+
+def _center(text: str, width: int) -> str:
+    # Odd paddings leave the extra space on the right, unlike str.center()
+    left = (width - len(text)) // 2
+    return ' ' * left + text.ljust(width - left)
+
+
+def _wrap(value, width: int) -> list:
+    return [
+        line for text in str(value).split('\n')
+        for line in (
+            textwrap.wrap(text, width) if len(text) > width else [text]
+        )
+    ]
+
+
+def _row_lines(style: dict, row: list, widths: list) -> list:
+    height = max(len(cell) for cell in row)
+    columns = []
+    for cell, width in zip(row, widths):
+        top = (height - len(cell)) // 2
+        lines = [''] * top + cell + [''] * (height - len(cell) - top)
+        columns.append([f' {_center(line, width)} ' for line in lines])
+    vertical = style['vertical']
+    return [
+        vertical + vertical.join(line) + vertical for line in zip(*columns)
+    ]
+
+
+class TableWriter():
+    """Render a table one row at a time with fixed column widths."""
+
+    def __init__(self, headers: list, widths: list, style='table'):
+        self.headers = headers
+        self.widths = widths
+        self.box = BOX_STYLES[style]
+        self.rows = 0
+
+    def row(self, row: list) -> str:
+        lines = []
+        if not self.rows:
+            lines.append(_rule(self.box, 'top', self.widths))
+            lines.extend(self._lines(self.headers))
+            lines.append(_rule(self.box, 'header', self.widths))
+        else:
+            lines.append(_rule(self.box, 'row', self.widths))
+        lines.extend(self._lines(row))
+        self.rows += 1
+        return '\n'.join(lines)
+
+    def close(self) -> str:
+        if not self.rows:
+            return None
+        return _rule(self.box, 'bottom', self.widths)
+
+    def _lines(self, row: list) -> list:
+        return _row_lines(
+            self.box,
+            [_wrap(value, width) for value, width in zip(row, self.widths)],
+            self.widths
+        )
+
+
+def render_table(rows: list, headers: list, style='table') -> str:
+    """Lay out rows of (possibly multi-line) cells as a centered grid."""
+
+    # Headers get two extra characters, as tabulate used to do
+    widths = [
+        max(
+            len(headers[column]) + 2,
+            *(
+                len(line) for row in rows
+                for line in str(row[column]).split('\n')
+            )
+        ) for column in range(len(headers))
+    ]
+    writer = TableWriter(headers, widths, style)
+    return '\n'.join([*(writer.row(row) for row in rows), writer.close()])
+
+
+def sort_events(events: list) -> list:
+    return sorted(
+        (e for e in events if e['links']),
+        key=lambda x: (x['date'], x['category'], x['title'])
+    )
+
+
+def event_to_dict(event: dict) -> dict:
+    return dict(event, date=event['date'].isoformat())
+
+
+def event_to_json(event: dict) -> str:
+    return json.dumps(event_to_dict(event), ensure_ascii=False)
+
+
+def events_table_rows(events: list) -> list:
+    return [
+        [
+            event['title'], event['category'],
+            *(
+                '\n'.join(link[key] for link in event['links'])
+                for key in ('url', 'language', 'bitrate')
+            )
+        ] for event in events
+    ]
+
+
+def channels_table_rows(channels: list) -> list:
+    return [[c['name'], c['link']] for c in channels]
+
+
+def events_csv_rows(events: list) -> list:
+    return [
+        [
+            event['date'].isoformat(), event['category'],
+            event['competition'], event['game'],
+            link['url'], link['language'], link['bitrate']
+        ] for event in events for link in event['links']
+    ]
+
+
+def events_m3u_lines(events: list) -> list:
+    lines = []
+    for event in events:
+        name = ' - '.join(event['title'].split('\n'))
+        for link in event['links']:
+            if not link['url'].startswith(ACESTREAM_PREFIX):
+                continue
+            lines.append(
+                f'#EXTINF:-1 group-title="{event["category"]}",{name} '
+                f'[{link["language"]}, {link["bitrate"]}]'
+            )
+            lines.append(link['url'])
+    return lines
+
+
+def _to_csv(header: list, rows: list) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return output.getvalue().rstrip('\n')
+
+
+def render_events(events: list, output='table') -> str:
+    events = sort_events(events)
+    if not events:
+        return None
+
+    if output in BOX_STYLES:
+        return render_table(events_table_rows(events), EVENTS_HEADERS, output)
+    if output == 'json':
+        return json.dumps(
+            [event_to_dict(event) for event in events],
+            ensure_ascii=False, indent=2
+        )
+    if output == 'csv':
+        return _to_csv(EVENTS_CSV_HEADERS, events_csv_rows(events))
+    if output == 'm3u':
+        return '\n'.join(['#EXTM3U', *events_m3u_lines(events)])
+    raise ValueError(f'"{output}" is not a supported output format')
+
+
+class EventWriter():
+    """Render events one at a time, writing the headers only once."""
+
+    def __init__(self, output='table'):
+        if output not in (*BOX_STYLES, 'ndjson', 'csv', 'm3u'):
+            raise ValueError(
+                f'"{output}" cannot be written one event at a time'
+            )
+        self.output = output
+        self.table = None
+        if output in BOX_STYLES:
+            self.table = TableWriter(EVENTS_HEADERS, EVENTS_WIDTHS, output)
+        self.started = False
+
+    def write(self, event: dict) -> str:
+        events = sort_events([event])
+        if not events:
+            return None
+        if self.table:
+            text = self.table.row(events_table_rows(events)[0])
+        elif self.output == 'ndjson':
+            text = event_to_json(event)
+        elif self.output == 'csv':
+            text = _to_csv(
+                None if self.started else EVENTS_CSV_HEADERS,
+                events_csv_rows(events)
+            )
+        else:
+            lines = events_m3u_lines(events)
+            if not lines:
+                return None
+            text = '\n'.join(lines if self.started else ['#EXTM3U', *lines])
+        self.started = True
+        return text
+
+    def close(self) -> str:
+        return self.table.close() if self.table else None
+
+
+def render_channels(channels: list, output='table') -> str:
+    if not channels:
+        return None
+
+    if output in BOX_STYLES:
+        return render_table(
+            channels_table_rows(channels), CHANNELS_HEADERS, output
+        )
+    if output == 'json':
+        return json.dumps(channels, ensure_ascii=False, indent=2)
+    if output == 'ndjson':
+        return '\n'.join(
+            json.dumps(channel, ensure_ascii=False) for channel in channels
+        )
+    if output == 'csv':
+        return _to_csv(['name', 'link'], channels_table_rows(channels))
+    if output == 'm3u':
+        lines = ['#EXTM3U']
+        for channel in channels:
+            lines.append(f'#EXTINF:-1,{channel["name"]}')
+            lines.append(channel['link'])
+        return '\n'.join(lines)
+    raise ValueError(f'"{output}" is not a supported output format')
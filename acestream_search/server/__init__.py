@@ -0,0 +1,253 @@
+import asyncio
+import datetime
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from acestream_search.channels import filter_channels
+from acestream_search.channels import get_channels
+from acestream_search.common.constants import CATEGORIES
+from acestream_search.common.constants import CATEGORY_CONCURRENCY
+from acestream_search.common.constants import SERVE_HOURS
+from acestream_search.common.constants import SERVE_INTERVAL
+from acestream_search.common.constants import SERVE_WAIT_TIMEOUT
+from acestream_search.common.constants import STARTED_EVENTS_HOURS
+from acestream_search.events import category_name
+from acestream_search.events import format_links
+from acestream_search.events import iter_events
+from acestream_search.log import logger
+from acestream_search.render import event_to_dict
+from acestream_search.store import EventStore
+
+
+class Snapshot():
+    """Last successfully fetched copy of a dataset."""
+
+    def __init__(self):
+        self.data = None
+        self.updated_at = None
+        self.error = None
+
+    def metadata(self) -> dict:
+        updated_at = self.updated_at
+        return {
+            'updated_at': datetime.datetime.fromtimestamp(
+                updated_at, datetime.timezone.utc
+            ).isoformat() if updated_at else None,
+            'age': round(time.time() - updated_at, 1) if updated_at else None,
+            'error': self.error
+        }
+
+
+class ServerState():
+    """In-memory events and channels, refreshed by a background thread."""
+
+    def __init__(
+        self, hours=SERVE_HOURS, interval=SERVE_INTERVAL,
+        concurrency=CATEGORY_CONCURRENCY, store: EventStore = None
+    ):
+        self.hours = hours
+        self.interval = interval
+        self.concurrency = concurrency
+        self.store = store
+        self.snapshots = {'events': Snapshot(), 'channels': Snapshot()}
+        self.refreshing = False
+        self.generation = 0
+        self.next_refresh_at = None
+        self.condition = threading.Condition()
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self._refresh_loop, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def request_refresh(self):
+        self.wakeup.set()
+
+    def _fetch_events(self) -> list:
+        async def collect():
+            return [
+                event async for event in iter_events(
+                    '', self.hours, concurrency=self.concurrency,
+                    store=self.store
+                )
+            ]
+
+        return asyncio.run(collect())
+
+    def _refresh(self, name: str, fetch):
+        snapshot = self.snapshots[name]
+        try:
+            data = fetch()
+        except Exception as e:
+            logger.error(f'Not able to refresh the {name}: {e}')
+            with self.condition:
+                snapshot.error = str(e)
+                self.condition.notify_all()
+            return
+        with self.condition:
+            snapshot.data = data
+            snapshot.updated_at = time.time()
+            snapshot.error = None
+            self.condition.notify_all()
+        logger.info(f'Refreshed the {name}: {len(data)} entries')
+
+    def _refresh_loop(self):
+        while True:
+            with self.condition:
+                self.refreshing = True
+            self._refresh('events', self._fetch_events)
+            self._refresh(
+                'channels', lambda: get_channels(max_age=self.interval)
+            )
+            with self.condition:
+                self.refreshing = False
+                self.generation += 1
+                self.next_refresh_at = time.time() + self.interval
+                self.condition.notify_all()
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
+    def wait_for(self, name: str, max_age: float, timeout=SERVE_WAIT_TIMEOUT):
+        """Wait for a refresh if the snapshot is older than max_age seconds."""
+
+        snapshot = self.snapshots[name]
+        with self.condition:
+            updated_at = snapshot.updated_at
+            if updated_at and time.time() - updated_at <= max_age:
+                return
+            generation = self.generation
+            if not self.refreshing:
+                self.request_refresh()
+            self.condition.wait_for(
+                lambda: self.generation > generation, timeout
+            )
+
+    def metadata(self, name: str) -> dict:
+        with self.condition:
+            metadata = self.snapshots[name].metadata()
+            metadata['refreshing'] = self.refreshing
+            metadata['next_refresh_at'] = datetime.datetime.fromtimestamp(
+                self.next_refresh_at, datetime.timezone.utc
+            ).isoformat() if self.next_refresh_at else None
+        return metadata
+
+    def query_events(
+        self, text: str, hours: int, category: str = None, show_empty=False
+    ) -> list:
+        pattern = re.compile(text, re.IGNORECASE)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        start = now - datetime.timedelta(hours=STARTED_EVENTS_HOURS)
+        end = now + datetime.timedelta(hours=hours)
+        name = category_name(category) if category else None
+        events = []
+        for event in self.snapshots['events'].data or []:
+            if name and event['category'] != name:
+                continue
+            if not start <= event['date'] <= end:
+                continue
+            if not (
+                pattern.search(event['game'])
+                or pattern.search(event['competition'])
+            ):
+                continue
+            links = format_links(event['links'] or [], show_empty, False)
+            if links:
+                events.append(event_to_dict(dict(event, links=links)))
+        return sorted(
+            events, key=lambda x: (x['date'], x['category'], x['title'])
+        )
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = 'acestream-search'
+
+    def log_message(self, format, *args):
+        logger.debug(f'{self.address_string()} {format % args}')
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {'error': message})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        state = self.server.state
+        if url.path == '/events':
+            name = 'events'
+        elif url.path == '/channels':
+            name = 'channels'
+        else:
+            self._send_error(404, f'Unknown path "{url.path}"')
+            return
+
+        try:
+            hours = int(params.get('hours', 1))
+            max_age = params.get('max_age')
+            max_age = float(max_age) if max_age is not None else None
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return
+        if not 0 <= hours <= state.hours:
+            self._send_error(
+                400, f'hours must be between 0 and {state.hours}'
+            )
+            return
+        category = params.get('category') or None
+        if category and category not in CATEGORIES:
+            self._send_error(400, f'Unknown category "{category}"')
+            return
+        text = params.get('search', '')
+        try:
+            if name == 'events':
+                re.compile(text)
+        except re.error as e:
+            self._send_error(400, f'Invalid search pattern: {e}')
+            return
+
+        if max_age is not None:
+            state.wait_for(name, max_age)
+        body = state.metadata(name)
+        if state.snapshots[name].data is None:
+            self._send_json(503, dict(body, **{name: None}))
+            return
+        if name == 'events':
+            body['events'] = state.query_events(
+                text, hours, category,
+                params.get('show_empty', '').lower() in ('1', 'true', 'yes')
+            )
+        else:
+            body['channels'] = filter_channels(
+                state.snapshots['channels'].data, text
+            )
+        self._send_json(200, body)
+
+
+def serve(
+    host: str, port: int, hours=SERVE_HOURS, interval=SERVE_INTERVAL,
+    concurrency=CATEGORY_CONCURRENCY, store: EventStore = None
+):
+    state = ServerState(hours, interval, concurrency, store)
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.state = state
+    state.start()
+    logger.info(f'Serving on http://{host}:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
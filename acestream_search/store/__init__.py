@@ -0,0 +1,175 @@
+import datetime
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from urllib.parse import urlsplit
+
+from acestream_search.common.constants import STARTED_EVENTS_HOURS
+from acestream_search.common.paths import STATE_DIR
+
+# Bumped on incompatible changes, older tables are dropped as the events
+# are fetched again anyway
+SCHEMA_VERSION = 2
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS events (
+    path TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    title TEXT NOT NULL,
+    competition TEXT NOT NULL,
+    game TEXT NOT NULL,
+    category TEXT NOT NULL,
+    date REAL NOT NULL,
+    links TEXT NOT NULL,
+    links_checked_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_date ON events (date);
+CREATE INDEX IF NOT EXISTS events_category_date ON events (category, date);
+'''
+
+
+def _regexp(pattern: str, value: str) -> bool:
+    return re.search(pattern, value or '', re.IGNORECASE) is not None
+
+
+def _split_url(url: str) -> tuple:
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    return f'{parts.scheme}://{parts.netloc}', path
+
+
+class EventStore():
+    """SQLite store of scraped events, keyed by event path."""
+
+    def __init__(self, path=os.path.join(STATE_DIR, 'events.sqlite3')):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                conn.executescript(
+                    'DROP TABLE IF EXISTS events;\n'
+                    f'PRAGMA user_version = {SCHEMA_VERSION};'
+                )
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.create_function('REGEXP', 2, _regexp, deterministic=True)
+        return conn
+
+    def expire(self) -> int:
+        limit = time.time() - STARTED_EVENTS_HOURS * 3600
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                'DELETE FROM events WHERE date < ?', (limit,)
+            ).rowcount
+
+    def get_links(self, urls: list, max_age: int) -> dict:
+        """Return the stored links checked within the last max_age seconds."""
+
+        if not urls:
+            return {}
+        paths = {_split_url(url)[1]: url for url in urls}
+        placeholders = ', '.join('?' for _ in paths)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f'SELECT path, links FROM events WHERE path IN '
+                f"({placeholders}) AND links != '[]' "
+                'AND links_checked_at > ?',
+                (*paths, time.time() - max_age)
+            ).fetchall()
+        return {paths[row['path']]: json.loads(row['links']) for row in rows}
+
+    def sync(self, events: list, checked_urls: set):
+        """Insert new events and update the ones whose details changed."""
+
+        now = time.time()
+        inserted = updated = 0
+        with closing(self._connect()) as conn, conn:
+            for event in events:
+                host, path = _split_url(event['url'])
+                links = json.dumps(event['links'] or [])
+                details = (
+                    event['title'], event['competition'], event['game'],
+                    event['category'], event['date'].timestamp()
+                )
+                row = conn.execute(
+                    'SELECT host, title, competition, game, category, date, '
+                    'links FROM events WHERE path = ?', (path,)
+                ).fetchone()
+                checked = event['url'] in checked_urls
+                if row is None:
+                    conn.execute(
+                        'INSERT INTO events '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (
+                            path, host, *details,
+                            links, now if checked else 0, now
+                        )
+                    )
+                    inserted += 1
+                    continue
+                if row['host'] != host:
+                    conn.execute(
+                        'UPDATE events SET host = ? WHERE path = ?',
+                        (host, path)
+                    )
+                # Events get rescheduled, the listing is always up to date
+                details_changed = tuple(row)[1:6] != details
+                if details_changed:
+                    conn.execute(
+                        'UPDATE events SET title = ?, competition = ?, '
+                        'game = ?, category = ?, date = ?, updated_at = ? '
+                        'WHERE path = ?',
+                        (*details, now, path)
+                    )
+                if row['links'] != links:
+                    conn.execute(
+                        'UPDATE events SET links = ?, links_checked_at = ?, '
+                        'updated_at = ? WHERE path = ?',
+                        (links, now, now, path)
+                    )
+                elif checked:
+                    conn.execute(
+                        'UPDATE events SET links_checked_at = ? '
+                        'WHERE path = ?',
+                        (now, path)
+                    )
+                if details_changed or row['links'] != links:
+                    updated += 1
+        return inserted, updated
+
+    def query(self, text: str, hours: int, category: str = None) -> list:
+        now = time.time()
+        sql = (
+            'SELECT * FROM events WHERE date BETWEEN ? AND ? '
+            'AND (competition REGEXP ? OR game REGEXP ?)'
+        )
+        params = [
+            now - STARTED_EVENTS_HOURS * 3600, now + hours * 3600, text, text
+        ]
+        if category:
+            sql += ' AND category = ?'
+            params.append(category)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                sql + ' ORDER BY date, category, title', params
+            ).fetchall()
+        return [
+            {
+                'title': row['title'],
+                'competition': row['competition'],
+                'game': row['game'],
+                'category': row['category'],
+                'date': datetime.datetime.fromtimestamp(
+                    row['date'], datetime.timezone.utc
+                ),
+                'url': row['host'] + row['path'],
+                'links': json.loads(row['links'])
+            } for row in rows
+        ]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Check that the entry points import within their time budget.
+
+Each module is imported in a fresh interpreter with -X importtime, and
+the best of several runs is compared with its budget, so a heavy
+dependency imported at module level again makes the check fail.
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+# Milliseconds, generous enough for slow CI runners
+BUDGETS = {
+    'acestream_search.acestream_search_launcher': 50,
+    'acestream_search.acestream_search_gui_launcher': 250
+}
+
+
+def import_time(module: str) -> float:
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    if result.returncode:
+        errors = [
+            line for line in result.stderr.splitlines()
+            if not line.startswith('import time:')
+        ]
+        sys.exit(f'Importing "{module}" failed:\n' + '\n'.join(errors))
+    pattern = re.compile(
+        rf'^import time:\s+\d+ \|\s+(\d+) \| {re.escape(module)}$'
+    )
+    for line in result.stderr.splitlines():
+        match = pattern.match(line)
+        if match:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f'No import time reported for "{module}"')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--runs',
+        type=int,
+        default=5,
+        help='Imports measured per module, the fastest one is used '
+        '(default: 5)'
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in BUDGETS.items():
+        elapsed = min(import_time(module) for _ in range(args.runs))
+        status = 'OK' if elapsed <= budget else 'OVER BUDGET'
+        print(f'{module}: {elapsed:.1f}ms (budget {budget}ms) {status}')
+        failed |= elapsed > budget
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()